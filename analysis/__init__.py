@@ -0,0 +1 @@
+# Python-side analysis of benchmark results (see runtime_stats.py).
@@ -0,0 +1,126 @@
+# Regression check between two sets of benchmark results.
+#
+# Pairs up the result files of two runs of the same cells (by their path
+# relative to the given directories), and for every per-op metric (KINDS:
+# run_times, enc_times and encoded sizes, all repeats pooled) tests whether
+# the new samples are shifted with a two-sided Mann-Whitney U test. The
+# p-values of all tests are Holm-corrected, and a change is only reported
+# when it is significant *and* the medians differ by more than --threshold:
+#
+#   $ python -m analysis.compare old/res2 res2 --threshold 0.05
+#
+#   cell              kind                     median_old  median_new  change  effect  p
+#   Logoot-2017_in... local_samples.run_times  0.0121      0.0140      +15.7%  +0.31   0.0000  worse
+#
+# `effect` is the rank-biserial correlation: P(new > old) - P(new < old), so
+# +1 means every new sample is larger. Larger times and sizes are `worse`,
+# and the exit status is 1 if anything got worse, so the check can gate a
+# change to a CRDT. With --clean, files measured under interference (see
+# `configuration.host`, scripts/hostmetrics.py) are left out.
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+from tabulate import tabulate
+
+from analysis import results, stats
+
+
+KINDS = re.compile(r'(^|\.)(run_times|enc_times|sizes)$')
+ALPHA = 0.01
+THRESHOLD = 0.05
+
+
+def pairs(old, new):
+    # (name, old file, new file) for the files present in both
+    if os.path.isfile(old):
+        yield os.path.basename(new), old, new
+        return
+    for root, dirs, files in os.walk(old):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith((results.SIDECAR_SUFFIX, results.HOST_SUFFIX)):
+                continue
+            a = os.path.join(root, name)
+            rel = os.path.relpath(a, old)
+            b = os.path.join(new, rel)
+            if os.path.isfile(b):
+                yield rel, a, b
+
+
+def pooled(res, kind):
+    cols = [results.as_numpy(c) for c in res.repeats(kind)]
+    return np.concatenate(cols) if cols else np.zeros(0)
+
+
+def compare(old, new, kinds=KINDS, alpha=ALPHA, threshold=THRESHOLD, clean=False):
+    rows = []
+    for name, a, b in pairs(old, new):
+        ra, rb = results.load(a), results.load(b)
+        if clean and (ra.interference or rb.interference):
+            print(f'{name}: skipped, interference:'
+                  f' {" ".join(ra.interference + rb.interference)}', file=sys.stderr)
+            continue
+        for kind in sorted(set(ra.kinds()) & set(rb.kinds())):
+            if not kinds.search(kind):
+                continue
+            x, y = pooled(ra, kind), pooled(rb, kind)
+            u, p = stats.mann_whitney(x, y)
+            if np.isnan(p):
+                continue
+            mx, my = np.nanmedian(x), np.nanmedian(y)
+            n1, n2 = np.count_nonzero(~np.isnan(x)), np.count_nonzero(~np.isnan(y))
+            rows.append({
+                'cell':       name,
+                'kind':       kind,
+                'median_old': mx.item(),
+                'median_new': my.item(),
+                'change':     (my / mx - 1).item() if mx else np.nan,
+                'effect':     1 - 2 * u / (n1 * n2),
+                'p':          p,
+            })
+    for row, p in zip(rows, stats.holm([r['p'] for r in rows])):
+        row['p'] = p.item()
+        row['verdict'] = verdict(row, alpha, threshold)
+    return rows
+
+
+def verdict(row, alpha, threshold):
+    if row['p'] >= alpha or not abs(row['change']) > threshold:
+        return '='
+    return 'worse' if row['change'] > 0 else 'better'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--alpha', type=float, default=ALPHA,
+                        help='significance level (after Holm correction)')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='smallest relative change of the median to report')
+    parser.add_argument('--kinds', type=re.compile, default=KINDS,
+                        help='regex of the sample kinds to compare')
+    parser.add_argument('--all', action='store_true', help='also list unchanged cells')
+    parser.add_argument('--clean', action='store_true',
+                        help='leave out results measured under interference')
+    parser.add_argument('old', help='result file or directory')
+    parser.add_argument('new', help='result file or directory')
+    args = parser.parse_args()
+
+    rows = compare(args.old, args.new, args.kinds, args.alpha, args.threshold, args.clean)
+    shown = [r for r in rows if args.all or r['verdict'] != '=']
+    table = [[r['cell'], r['kind'], f"{r['median_old']:.4g}", f"{r['median_new']:.4g}",
+              f"{r['change']:+.1%}", f"{r['effect']:+.2f}", f"{r['p']:.4f}", r['verdict']]
+             for r in shown]
+    print(tabulate(table, headers=['cell', 'kind', 'median_old', 'median_new',
+                                   'change', 'effect', 'p', ''],
+                   disable_numparse=True))
+    worse = sum(r['verdict'] == 'worse' for r in rows)
+    better = sum(r['verdict'] == 'better' for r in rows)
+    print(f'\n{len(rows)} compared, {worse} worse, {better} better', file=sys.stderr)
+    sys.exit(1 if worse else 0)
+
+
+if __name__ == '__main__':
+    main()
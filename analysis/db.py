@@ -0,0 +1,241 @@
+# SQLite database of all benchmark results.
+#
+# Ingests the result files written by the jobs of scripts/gen-jobs.py
+# (res2/, res4/) into one database, so that questions across CRDTs and
+# datasets are a query instead of re-parsing every JSON file:
+#
+#   $ python -m analysis.db ingest              # res2/ and res4/ -> results.db
+#   $ sqlite3 results.db "select crdt, dataset, avg(p50) from runs
+#         where benchmark = 'linear-time' and kind = 'local_samples.run_times'
+#         group by crdt, dataset"
+#
+# Tables:
+#
+#   files    path, size, mtime_ns, error -- every file ingested
+#   runs     one row per sample array (file, kind, repeat), with the crdt,
+#            dataset, benchmark (see BENCHMARKS), peer (the replayed log of
+#            causal/git replays), and count/sum/mean/min/p50/p99/max
+#   samples  run -> the sample array as a blob (see samples())
+#
+# Ingesting is incremental: a file whose size and mtime did not change is
+# skipped, and a changed one has its runs replaced, so `ingest` can simply be
+# re-run after every sweep.
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+
+import numpy as np
+
+from analysis import results, stats
+
+
+DB = 'results.db'
+DIRS = ['res2', 'res4']
+SKIP_SUFFIXES = (results.SIDECAR_SUFFIX, results.HOST_SUFFIX, '.tmp', '.out')
+
+ALGORITHMS = ['Automerge+WASM', 'Automerge', 'Yjs', 'RGA', 'Logoot', 'LSEQ',
+              'Treedoc', 'Woot', 'DLS']
+
+# The output names of scripts/gen-jobs.py, after the `{alg}-` prefix; the
+# first match wins.
+BENCHMARKS = [
+    ('user-ops-remote',   r'uo-r1-(?P<data>.+)'),
+    ('user-ops',          r'uo-(?P<data>.+)'),
+    ('linear-10k-encdec', r'(?P<data>.+)-10k-encdec'),
+    ('causal-sizes',      r'(?P<data>.+)-causal-sizes'),
+    ('causal-replay-mem', r'(?P<data>.+\.json)-(?P<peer>\d+)-mem'),
+    ('causal-replay',     r'(?P<data>.+\.json)-(?P<peer>\d+)'),
+    ('git-merges',        r'(?P<data>.+)-merges'),
+    ('git-restore',       r'(?P<data>.+)-restore'),
+    ('git-replay',        r'(?P<data>.+)-replay-(?P<peer>\d+)'),
+    ('encdec',            r'(?P<data>.+)-encdec'),
+    ('linear-10',         r'(?P<data>.+)-10'),
+    ('linear-time',       r'(?P<data>.+)'),
+]
+_BENCHMARKS = [(name, re.compile(pattern)) for name, pattern in BENCHMARKS]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT PRIMARY KEY,
+    size      INTEGER,
+    mtime_ns  INTEGER,
+    meta      TEXT,
+    error     TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id        INTEGER PRIMARY KEY,
+    path      TEXT NOT NULL REFERENCES files(path),
+    crdt      TEXT,
+    dataset   TEXT,
+    benchmark TEXT,
+    peer      INTEGER,
+    kind      TEXT,
+    repeat    INTEGER,
+    count     INTEGER,
+    sum       REAL,
+    mean      REAL,
+    min       REAL,
+    p50       REAL,
+    p99       REAL,
+    max       REAL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run       INTEGER PRIMARY KEY REFERENCES runs(id),
+    typecode  TEXT,
+    data      BLOB
+);
+CREATE INDEX IF NOT EXISTS runs_cell ON runs(crdt, dataset, benchmark, repeat);
+CREATE INDEX IF NOT EXISTS runs_path ON runs(path);
+'''
+
+
+def connect(fn=DB):
+    conn = sqlite3.connect(fn)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def classify(path):
+    # (crdt, dataset, benchmark, peer) from the name of a result file
+    name = os.path.basename(path)
+    for alg in ALGORITHMS:
+        if name.startswith(alg + '-'):
+            rest = name[len(alg) + 1:]
+            break
+    else:
+        return None, None, None, None
+    for bench, pattern in _BENCHMARKS:
+        m = pattern.fullmatch(rest)
+        if m:
+            peer = m.groupdict().get('peer')
+            if bench == 'encdec' and os.path.basename(os.path.dirname(path)) == 'res4':
+                bench = 'git-encdec'
+            return alg, m.group('data'), bench, peer and int(peer)
+    return alg, None, None, None
+
+
+def result_files(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.endswith(SKIP_SUFFIXES):
+                    yield os.path.join(root, name)
+
+
+def _unchanged(conn, path, st):
+    row = conn.execute('SELECT size, mtime_ns FROM files WHERE path = ?',
+                       (path,)).fetchone()
+    return row == (st.st_size, st.st_mtime_ns)
+
+
+def _forget(conn, path):
+    conn.execute('DELETE FROM samples WHERE run IN (SELECT id FROM runs WHERE path = ?)',
+                 (path,))
+    conn.execute('DELETE FROM runs WHERE path = ?', (path,))
+    conn.execute('DELETE FROM files WHERE path = ?', (path,))
+
+
+def ingest_file(conn, path):
+    # Returns True if the file was (re-)ingested, False if unchanged
+    st = os.stat(path)
+    if _unchanged(conn, path, st):
+        return False
+    crdt, dataset, bench, peer = classify(path)
+    try:
+        res = results.load(path, cache=False)
+        error = None
+    except (ValueError, UnicodeDecodeError) as e:
+        res = None
+        error = str(e)
+    with conn:
+        _forget(conn, path)
+        conn.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?)',
+                     (path, st.st_size, st.st_mtime_ns,
+                      None if res is None else json.dumps(res.meta), error))
+        if res is None:
+            return True
+        # the file name follows the job matrix, the configuration may not
+        crdt = crdt or res.crdt
+        dataset = dataset or res.dataset
+        summary = stats.describe({k: results.as_numpy(c) for k, c in res.columns.items()},
+                                 percentiles=(0.50, 0.99))
+        for (kind, repeat), col in res.columns.items():
+            s = summary[kind, repeat]
+            cur = conn.execute(
+                'INSERT INTO runs (path, crdt, dataset, benchmark, peer, kind, repeat,'
+                ' count, sum, mean, min, p50, p99, max)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, crdt, dataset, bench, peer, kind, repeat, s['count'],
+                 *(_real(s[k]) for k in ('sum', 'mean', 'min', 'p50', 'p99', 'max'))))
+            mv = memoryview(col)
+            conn.execute('INSERT INTO samples VALUES (?, ?, ?)',
+                         (cur.lastrowid, mv.format, mv.cast('B').tobytes()))
+    return True
+
+
+def _real(x):
+    return None if np.isnan(x) else x
+
+
+def ingest(conn, paths=DIRS, prune=True):
+    # Ingests new and changed files; with prune, files that no longer exist
+    # are removed. Returns (ingested, unchanged, removed).
+    done = unchanged = 0
+    seen = set()
+    for path in result_files(paths):
+        seen.add(path)
+        if ingest_file(conn, path):
+            done += 1
+            print(f'ingested {path}', file=sys.stderr)
+        else:
+            unchanged += 1
+    removed = 0
+    if prune:
+        roots = tuple(os.path.join(p, '') for p in paths if os.path.isdir(p))
+        gone = [p for [p] in conn.execute('SELECT path FROM files')
+                if p not in seen and p.startswith(roots)]
+        with conn:
+            for p in gone:
+                _forget(conn, p)
+        removed = len(gone)
+    return done, unchanged, removed
+
+
+def samples(conn, run):
+    # The sample array of a run, as a NumPy array
+    typecode, data = conn.execute('SELECT typecode, data FROM samples WHERE run = ?',
+                                  (run,)).fetchone()
+    return np.frombuffer(data, dtype=typecode)
+
+
+def find(conn, **where):
+    # ids of the runs matching e.g. crdt='RGA', kind='local_samples.run_times'
+    sql = 'SELECT id FROM runs'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(f'{k} = ?' for k in where)
+    return [i for [i] in conn.execute(sql + ' ORDER BY id', tuple(where.values()))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--db', default=DB)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('ingest', help='add new and changed result files')
+    p.add_argument('paths', nargs='*', default=DIRS)
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.cmd == 'ingest':
+        done, unchanged, removed = ingest(conn, args.paths)
+        print(f'{done} ingested, {unchanged} unchanged, {removed} removed', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# Binned per-op latency curves.
+#
+# A result file has one run_times/enc_times entry per op and repeat (25k+
+# ops per sample), which runtime_stats.py collapses into a single row. Here
+# the ops are instead put into fixed-width bins, either by op index or by the
+# size of the document when the op ran, and every bin is summarised
+# (count/min/p50/p99/max, see stats.describe()) over all repeats, so that
+# latency-vs-size curves of every CRDT can be plotted from a few hundred rows.
+#
+# Ops far above their bin's median are flagged as outliers (typically GC
+# pauses): v > p50 + OUTLIER_K * 1.4826 * MAD, the MAD being the median
+# absolute deviation of the bin, and v > OUTLIER_RATIO * p50 so that the
+# ordinary jitter of bins with a tiny MAD does not count. `outliers` counts
+# them per bin, and `p50` etc. are computed over all ops, outliers included.
+#
+#   $ python -m analysis.latency res2/RGA-microRTL res2/Yjs-microRTL -o rtl.csv
+#   $ python -m analysis.latency res2/RGA-Jesus --trace .wiki-traces/Jesus \
+#         --kind local_samples.enc_times --width 100 -o jesus.cols
+#
+# Tables are written as CSV, or (for a `.cols` file name) in the column
+# format of analysis/results.py, to be loaded with results.read_columns().
+import argparse
+import csv
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+
+from analysis import results, stats
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import ctrace  # noqa: E402
+
+
+OUTLIER_K = 6
+OUTLIER_RATIO = 10
+COLUMNS = ['crdt', 'dataset', 'kind', 'by', 'lo', 'hi', 'count',
+           'min', 'p50', 'p99', 'max', 'mad', 'outliers']
+
+
+def doc_lengths(ops):
+    # Length of the document after each per-char splice op (crunch/data.js)
+    delta = np.fromiter((len(op[2]) if op[1] == 0 else -op[1] for op in ops),
+                        dtype=np.int64)
+    return np.cumsum(delta)
+
+
+def trace_file(fn):
+    # The file crunch/data.js reads for a trace: the compact or NDJSON one
+    # next to it if there is one
+    for suffix in (ctrace.SUFFIX, '.ndjson'):
+        if os.path.exists(fn + suffix):
+            return fn + suffix
+    return fn
+
+
+def trace_ops(fn):
+    # The ops of a linear trace file (compact, JSON or NDJSON), in benchmark
+    # order
+    if fn.endswith(ctrace.SUFFIX):
+        with open(fn, 'rb') as fp:
+            for runs in ctrace.read(fp):
+                yield from ctrace.expand(runs)
+        return
+    with open(fn) as fp:
+        if fn.endswith('.ndjson'):
+            for line in fp:
+                if line.strip():
+                    yield from json.loads(line)
+        else:
+            for rev in json.load(fp):
+                yield from rev
+
+
+def _segments(bins, values):
+    # {bin: values} with the values grouped by their bin number
+    order = np.argsort(bins, kind='stable')
+    bins = bins[order]
+    values = values[order]
+    edges = np.flatnonzero(np.diff(bins)) + 1
+    starts = np.concatenate([[0], edges])
+    ends = np.concatenate([edges, [len(bins)]])
+    return {int(bins[s]): values[s:e] for s, e in zip(starts, ends) if e > s}
+
+
+def binned(samples, width, x=None):
+    # samples: list of per-op arrays (one per repeat); x: the value to bin by
+    # for each op index (default: the op index itself).
+    # Returns a list of rows (dicts with the bin's lo/hi and its statistics)
+    # and the indices (op index) of every outlier op.
+    m = stats.stack(samples)
+    if m.size == 0:
+        return [], np.zeros(0, dtype=np.int64)
+    n = m.shape[1]
+    if x is None:
+        x = np.arange(n)
+    x = np.asarray(x, dtype=np.float64)[:n]
+    if len(x) < n:
+        raise ValueError(f'{len(x)} x values for {n} ops')
+    idx = np.tile(np.arange(n), m.shape[0])
+    values = m.ravel()
+    keep = ~np.isnan(values)
+    idx = idx[keep]
+    values = values[keep]
+    bins = (x[idx] // width).astype(np.int64)
+
+    groups = _segments(bins, values)
+    summary = stats.describe(groups, percentiles=(0.50, 0.99))
+    med = np.array([summary[b]['p50'] for b in groups])
+    dev = {b: np.abs(v - m_) for (b, v), m_ in zip(groups.items(), med)}
+    mad = {b: s['p50'] for b, s in stats.describe(dev, percentiles=(0.50,)).items()}
+
+    keys = np.array(list(groups))
+    limit = np.array([max(summary[b]['p50'] + OUTLIER_K * 1.4826 * mad[b],
+                          OUTLIER_RATIO * summary[b]['p50']) for b in groups])
+    spike = values > limit[np.searchsorted(keys, bins)]
+    outliers = np.unique(idx[spike])
+    per_bin = dict(zip(*np.unique(bins[spike], return_counts=True)))
+
+    rows = []
+    for b in groups:
+        s = summary[b]
+        rows.append({
+            'lo':       b * width,
+            'hi':       (b + 1) * width,
+            'count':    s['count'],
+            'min':      s['min'],
+            'p50':      s['p50'],
+            'p99':      s['p99'],
+            'max':      s['max'],
+            'mad':      mad[b],
+            'outliers': int(per_bin.get(b, 0)),
+        })
+    return rows, outliers
+
+
+def table(fns, kind, width, trace=None, by=None):
+    # Binned rows of `kind` for every result file, with crdt/dataset/kind
+    x = None
+    if trace is not None:
+        x = doc_lengths(trace_ops(trace_file(trace)))
+        by = 'doc_length'
+    out = []
+    for fn in fns:
+        r = results.load(fn)
+        if by is not None and trace is None:
+            x = results.as_numpy(r.get(by))
+        rows, _ = binned([results.as_numpy(c) for c in r.repeats(kind)], width, x)
+        for row in rows:
+            row.update(crdt=r.crdt, dataset=r.dataset, kind=kind, by=by or 'op')
+            out.append(row)
+    return out
+
+
+def write_csv(rows, fp):
+    w = csv.DictWriter(fp, COLUMNS, lineterminator='\n')
+    w.writeheader()
+    w.writerows(rows)
+
+
+def write_cols(rows, fn, meta=None):
+    # One column per field; strings as codes into `categories`
+    columns = {}
+    categories = {}
+    for name in COLUMNS:
+        values = [row[name] for row in rows]
+        if any(isinstance(v, str) for v in values):
+            cats = sorted(set(values))
+            codes = {v: i for i, v in enumerate(cats)}
+            categories[name] = cats
+            columns[name, 0] = array('i', (codes[v] for v in values))
+        else:
+            columns[name, 0] = array('d', values)
+    results.write_columns(fn, meta or {}, columns, categories)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--kind', default='local_samples.run_times',
+                        help='column of the per-op times')
+    parser.add_argument('--width', type=float, default=1000,
+                        help='width of a bin (ops, chars or bytes)')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--trace', help='bin by document length, from this linear trace'
+                                       ' (.wiki-traces/X reads X.ct or X.ndjson if there)')
+    group.add_argument('--by', help='bin by another per-op column, e.g. sizes')
+    parser.add_argument('-o', '--output', help='.csv or .cols file (default: CSV on stdout)')
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    rows = table(args.files, args.kind, args.width, args.trace, args.by)
+    if args.output and args.output.endswith(results.SIDECAR_SUFFIX):
+        write_cols(rows, args.output, {'width': args.width})
+    elif args.output:
+        with open(args.output, 'w', newline='') as fp:
+            write_csv(rows, fp)
+    else:
+        write_csv(rows, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+# Memory-growth models from the memory_samples of bench/linear-time.js.
+#
+# Every memory sample is the heap used after each SAMPLE_EVERY ops of the
+# trace (and after the last op). The repeats are aggregated into a median
+# curve, and two models are fitted to it:
+#
+#   linear:  heap(n) = a * n + c      (a = bytes per op, or per live char)
+#   power:   heap(n) = k * n ** b     (b > 1 + SUPERLINEAR: superlinear)
+#
+# The model that fits is then used to extrapolate to larger documents, e.g.
+# whether a 1M-op document of a CRDT fits into the RAM of a node:
+#
+#   $ python -m analysis.memory res2/*-microRTL --ops 1000000 --ram 64G
+#   $ python -m analysis.memory res2/Logoot-Jesus --trace .wiki-traces/Jesus
+#
+# With --trace, memory is also related to the number of live chars (the
+# document length after each op, see analysis/latency.py); otherwise every op
+# is taken to insert one char, as in the micro traces.
+#
+# A run is flagged as diverging when its heap grows much faster than its
+# encoded size: the heap per byte of the ops encoded so far (the cumulative
+# `sizes`) goes up by more than DIVERGENCE from the middle to the end.
+import argparse
+import csv
+import re
+import sys
+
+import numpy as np
+
+from analysis import latency, results, stats
+
+
+SAMPLE_EVERY = 1000
+SUPERLINEAR = 0.1
+DIVERGENCE = 1.5
+UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+COLUMNS = ['crdt', 'dataset', 'ops', 'heap', 'bytes_per_op', 'bytes_per_char',
+           'exponent', 'model', 'diverging', 'predicted_ops', 'predicted',
+           'fits']
+
+
+def parse_bytes(s):
+    m = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?', s.strip(), re.I)
+    if m is None:
+        raise ValueError(f'not a size: {s}')
+    return float(m.group(1)) * UNITS[m.group(2).upper()]
+
+
+def sample_points(count, ops):
+    # Number of ops applied at each of `count` memory samples
+    x = np.arange(count, dtype=np.float64) * SAMPLE_EVERY
+    return np.minimum(x, ops) if ops else x
+
+
+def fit_linear(x, y):
+    # (a, c) of y = a * x + c
+    a, c = np.polyfit(x, y, 1)
+    return a.item(), c.item()
+
+
+def fit_power(x, y):
+    # (k, b) of y = k * x ** b, fitted on the samples with x, y > 0
+    ok = (x > 0) & (y > 0)
+    if ok.sum() < 2:
+        return np.nan, np.nan
+    b, logk = np.polyfit(np.log(x[ok]), np.log(y[ok]), 1)
+    return np.exp(logk).item(), b.item()
+
+
+class Growth:
+    def __init__(self, x, heap, chars=None):
+        self.x = x
+        self.heap = heap
+        self.a, self.c = fit_linear(x, heap)
+        self.k, self.b = fit_power(x, heap)
+        self.per_char = np.nan
+        self.diverging = []  # repeats, see diverging()
+        if chars is not None:
+            self.per_char = fit_linear(chars, heap)[0]
+
+    @property
+    def model(self):
+        if self.b > 1 + SUPERLINEAR:
+            return 'superlinear'
+        return 'linear'
+
+    def predict(self, n):
+        if self.model == 'superlinear':
+            return self.k * n ** self.b
+        return self.a * n + self.c
+
+
+def diverging(x, heap, encoded):
+    # heap / encoded bytes at the end vs. in the middle of the trace
+    ok = (encoded > 0) & (x > 0)
+    if ok.sum() < 2:
+        return False
+    ratio = heap[ok] / encoded[ok]
+    mid = ratio[len(ratio) // 2]
+    return bool(mid > 0 and ratio[-1] / mid > DIVERGENCE)
+
+
+def analyse(r, lengths=None):
+    # Growth of one result file, None if it has no memory samples
+    runs = [results.as_numpy(c) for c in r.repeats('memory_samples.memory')]
+    if not runs:
+        return None
+    heap = stats.per_op_median(runs)
+    ops = 0
+    if ('sizes', 0) in r.columns:
+        sizes = results.as_numpy(r.get('sizes'))
+        ops = len(sizes)
+        encoded = np.concatenate([[0], np.cumsum(sizes)])
+    x = sample_points(len(heap), ops)
+    chars = None
+    if lengths is not None:
+        lengths = np.concatenate([[0], lengths])
+        chars = lengths[np.minimum(x.astype(np.int64), len(lengths) - 1)]
+    g = Growth(x, heap, chars if chars is not None else x)
+    if ops:
+        at = encoded[np.minimum(x.astype(np.int64), ops)]
+        g.diverging = [i for i, run in enumerate(runs)
+                       if diverging(x[:len(run)], run, at[:len(run)])]
+    return g
+
+
+def table(fns, predict_ops=None, ram=None, trace=None):
+    lengths = None
+    if trace is not None:
+        lengths = latency.doc_lengths(latency.trace_ops(trace))
+    rows = []
+    for fn in fns:
+        r = results.load(fn)
+        g = analyse(r, lengths)
+        if g is None:
+            print(f'{fn}: no memory samples', file=sys.stderr)
+            continue
+        row = {
+            'crdt':           r.crdt,
+            'dataset':        r.dataset,
+            'ops':            int(g.x[-1]),
+            'heap':           g.heap[-1].item(),
+            'bytes_per_op':   g.a,
+            'bytes_per_char': g.per_char,
+            'exponent':       g.b,
+            'model':          g.model,
+            'diverging':      ' '.join(map(str, g.diverging)),
+        }
+        if predict_ops:
+            row['predicted_ops'] = predict_ops
+            row['predicted'] = g.predict(predict_ops)
+            if ram:
+                row['fits'] = 'yes' if row['predicted'] <= ram else 'no'
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ops', type=int,
+                        help='extrapolate the heap to a document of this many ops')
+    parser.add_argument('--ram', type=parse_bytes,
+                        help='check the extrapolated heap against this, e.g. 64G')
+    parser.add_argument('--trace', help='the linear trace the results were measured on')
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    rows = table(args.files, args.ops, args.ram, args.trace)
+    w = csv.DictWriter(sys.stdout, COLUMNS, lineterminator='\n')
+    w.writeheader()
+    w.writerows(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# Hot functions and allocation sites from `gen-jobs.py --profile` runs.
+#
+# Every profiled job leaves a `prof/<job>/job.json` listing its node
+# commands, and for each of them a directory with the `.cpuprofile` (V8 CPU
+# profiler) and `.heapprofile` (sampling heap profiler) that node wrote on
+# exit. This reads all of them and tabulates, per profile, the share of the
+# CPU time (self or inclusive) or of the sampled heap of every function, or
+# of every COMPONENTS group, so that e.g. the vector clocks of
+# crunch/peer.js, the encoding in crunch/encode.js and the CRDT itself can
+# be compared across datasets:
+#
+#   $ python -m analysis.profiles prof/ --crdt RGA --by component
+#   $ python -m analysis.profiles prof/ --heap --top 20 --csv > alloc.csv
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+
+from tabulate import tabulate
+
+from analysis import db
+
+
+# url pattern -> component, the first match wins
+COMPONENTS = [
+    (r'crunch/peer\.js$',                      'crunch/peer.js'),
+    (r'crunch/encode\.js$',                    'crunch/encode.js'),
+    (r'/crunch/',                              'crunch (other)'),
+    (r'/(RGA|logoot|lseqtree|treedoc|woot-crdt|automerge[^/]*|vector-clock)/'
+     r'|node_modules/(yjs|lib0|dotted-logootsplit|automerge[^/]*)/', 'CRDT'),
+    (r'/bench/',                               'bench'),
+    (r'node_modules/',                         'dependencies'),
+    (r'^(node:|internal/)',                    'node'),
+]
+_COMPONENTS = [(re.compile(p), name) for p, name in COMPONENTS]
+SPECIAL = {'(garbage collector)': 'GC', '(program)': 'V8', '(idle)': 'idle', '(root)': 'V8'}
+
+
+def component(frame):
+    name = frame['functionName']
+    if not frame['url'] and name in SPECIAL:
+        return SPECIAL[name]
+    for pattern, comp in _COMPONENTS:
+        if pattern.search(frame['url']):
+            return comp
+    return 'other'
+
+
+def function(frame):
+    url = frame['url']
+    if url.startswith('file://'):
+        url = os.path.relpath(url[len('file://'):])
+    line = frame['lineNumber'] + 1
+    where = f' {url}:{line}' if url else ''
+    return (frame['functionName'] or '(anonymous)') + where
+
+
+def cpu_times(fn, key=function):
+    # {key: [self, total]} in ms, from a .cpuprofile
+    with open(fn) as fp:
+        prof = json.load(fp)
+    nodes = {n['id']: n for n in prof['nodes']}
+    parent = {c: n['id'] for n in prof['nodes'] for c in n.get('children', ())}
+    self_time = defaultdict(float)
+    deltas = prof['timeDeltas'][1:] + [0]
+    for node, dt in zip(prof['samples'], deltas):
+        self_time[node] += dt / 1000
+    out = defaultdict(lambda: [0.0, 0.0])
+    for node, t in self_time.items():
+        out[key(nodes[node]['callFrame'])][0] += t
+        seen = set()
+        while node is not None:
+            k = key(nodes[node]['callFrame'])
+            if k not in seen:
+                seen.add(k)
+                out[k][1] += t
+            node = parent.get(node)
+    return out
+
+
+def heap_sizes(fn, key=function):
+    # {key: [self, total]} in bytes, from a .heapprofile
+    with open(fn) as fp:
+        prof = json.load(fp)
+    out = defaultdict(lambda: [0.0, 0.0])
+    stack = [(prof['head'], ())]
+    while stack:
+        node, above = stack.pop()
+        k = key(node['callFrame'])
+        size = node.get('selfSize', 0)
+        out[k][0] += size
+        for a in set(above + (k,)):
+            out[a][1] += size
+        for child in node.get('children', ()):
+            stack.append((child, above + (k,)))
+    return out
+
+
+def crdt_of(name, cmd):
+    m = re.search(r"-c\s+'?([\w+]+)", cmd)
+    if m:
+        return m.group(1)
+    for alg in db.ALGORITHMS:
+        if f'-{alg}-' in f'-{name}-' or f' {alg} ' in cmd:
+            return alg
+    return None
+
+
+def profiles(root):
+    # (crdt, label, step directory) of every profiled node command
+    for spec in sorted(glob.glob(os.path.join(root, '**', 'job.json'), recursive=True)):
+        with open(spec) as fp:
+            job = json.load(fp)
+        name = os.path.basename(job['job'])[:-len('-prof')]
+        for step in job['steps']:
+            script = os.path.splitext(os.path.basename(step['cmd'].split()[0]))[0]
+            yield crdt_of(name, step['cmd']), f'{name}/{script}', step['dir']
+
+
+def table(root, heap=False, by='function', inclusive=False, crdt=None, top=30):
+    # (labels, rows): rows of [key, share in every profile, ...], the keys
+    # with the largest share in any profile first
+    key = component if by == 'component' else function
+    read, suffix = (heap_sizes, 'heapprofile') if heap else (cpu_times, 'cpuprofile')
+    labels = []
+    shares = defaultdict(dict)
+    for alg, label, d in profiles(root):
+        if crdt is not None and alg != crdt:
+            continue
+        fns = sorted(glob.glob(os.path.join(d, f'*.{suffix}')))
+        if not fns:
+            continue
+        merged = defaultdict(float)
+        for fn in fns:
+            for k, v in read(fn, key).items():
+                merged[k] += v[1 if inclusive else 0]
+        if inclusive:
+            total = max(merged.values(), default=0)  # the root covers everything
+        else:
+            total = sum(merged.values())
+        labels.append(label)
+        for k, v in merged.items():
+            shares[k][label] = v / total if total else 0
+    ranked = sorted(shares, key=lambda k: -max(shares[k].values()))
+    if top:
+        ranked = ranked[:top]
+    rows = [[k] + [shares[k].get(label, 0) for label in labels] for k in ranked]
+    return labels, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--heap', action='store_true',
+                        help='allocation sites instead of CPU time')
+    parser.add_argument('--by', choices=['function', 'component'], default='function')
+    parser.add_argument('--inclusive', action='store_true',
+                        help='include the time/memory of callees')
+    parser.add_argument('--crdt', help='only the profiles of this CRDT')
+    parser.add_argument('--top', type=int, default=30)
+    parser.add_argument('--csv', action='store_true')
+    parser.add_argument('root', nargs='?', default='prof')
+    args = parser.parse_args()
+
+    labels, rows = table(args.root, args.heap, args.by, args.inclusive,
+                         args.crdt, args.top)
+    if args.csv:
+        w = csv.writer(sys.stdout, lineterminator='\n')
+        w.writerow([args.by] + labels)
+        w.writerows(rows)
+    else:
+        print(tabulate([[r[0]] + [f'{x:.1%}' for x in r[1:]] for r in rows],
+                       headers=[args.by] + labels, disable_numparse=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,420 @@
+# Streaming, columnar loader for benchmark result files.
+#
+# The benchmarks (see bench/format.js) emit one large JSON object per run,
+# where most of the bytes are long arrays of numbers (run_times, enc_times,
+# sizes, memory, ...). Instead of json.load()-ing everything into lists of
+# Python floats, we walk the file incrementally and store every numeric
+# array as an array('d'), keyed by (kind, repeat):
+#
+#   {"local_samples": [{"run_times": [...]}, ...]}
+#     ==> ('local_samples.run_times', 0), ('local_samples.run_times', 1) ...
+#   {"sizes": [...]}
+#     ==> ('sizes', 0)
+#
+# Arrays of small rows, e.g. the [tag, op_idx, time] triples written by
+# bench/replay-causal-traces.js, are split into one column per position
+# ('samples.run_times.0', 'samples.run_times.1', ...). Strings in those
+# columns are stored as integer codes into a per-column `categories` list.
+# Everything else (configuration, scalars) is kept as-is in `meta`.
+#
+# The parsed form is cached next to the result file (`<fn>.cols`), and later
+# loads memory-map that sidecar instead of re-parsing the JSON.
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+
+CHUNK_SIZE = 1 << 20
+SIDECAR_SUFFIX = '.cols'
+HOST_SUFFIX = '.host'  # host metrics of the run, see scripts/hostmetrics.py
+MAGIC = b'CRCOLS\x00\x01'
+ALIGN = 8
+
+_WS = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+_decoder = json.JSONDecoder()
+
+
+class Results:
+    def __init__(self, meta, columns, categories=None, source=None):
+        self.meta = meta
+        self.columns = columns  # (kind, repeat) -> array / memoryview
+        self.categories = categories or {}  # kind -> [str, ...]
+        self.source = source
+
+    @property
+    def configuration(self):
+        return self.meta.get('configuration', {})
+
+    @property
+    def interference(self):
+        # What disturbed the run (throttled, overloaded, swapping), if known
+        return self.configuration.get('host', {}).get('interference', '').split()
+
+    @property
+    def crdt(self):
+        return self.configuration.get('crdt_name')
+
+    @property
+    def dataset(self):
+        cfg = self.configuration
+        return cfg.get('data_name') or cfg.get('filename') or cfg.get('log_file')
+
+    def kinds(self):
+        return sorted({kind for kind, _ in self.columns})
+
+    def get(self, kind, repeat=0):
+        return self.columns[kind, repeat]
+
+    def repeats(self, kind):
+        keys = sorted(r for k, r in self.columns if k == kind)
+        return [self.columns[kind, r] for r in keys]
+
+    def items(self, crdt=None, dataset=None):
+        crdt = crdt or self.crdt
+        dataset = dataset or self.dataset
+        for (kind, repeat), col in self.columns.items():
+            yield (crdt, dataset, kind, repeat), col
+
+
+# Streaming parser
+# ================
+
+class _Stream:
+    def __init__(self, fp):
+        self.fp = fp
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        data = self.fp.read(CHUNK_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f'expected {ch!r} at offset {self.pos}')
+        self.pos += 1
+
+    def scalar(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a number can be cut in half by the chunk boundary, also right
+            # after its '.', exponent or sign ('2.' decodes as 2)
+            if not self.eof and _NUMBER_TAIL.match(self.buf, end).end() == len(self.buf) \
+                    and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def numbers(self):
+        # (numbers, True) up to the closing ']'; at anything else, e.g. a
+        # string, (the numbers so far, False) with the position left at the
+        # start of the chunk that did not parse
+        out = array('d')
+        while True:
+            end = self.buf.find(']', self.pos)
+            cut = end if end >= 0 else self.buf.rfind(',', self.pos)
+            if cut >= 0:
+                try:
+                    _extend(out, self.buf[self.pos:cut])
+                except ValueError:
+                    return out, False
+                self.pos = cut + 1
+                if end >= 0:
+                    return out, True
+            if not self.fill():
+                raise ValueError('unterminated array')
+
+
+def _float(s):
+    s = s.strip()
+    return float('nan') if s == 'null' else float(s)
+
+
+def _extend(out, text):
+    if not text.strip():
+        return
+    parts = text.split(',')
+    try:
+        out.extend(array('d', map(float, parts)))
+    except ValueError:
+        out.extend(array('d', map(_float, parts)))
+
+
+class _Parser:
+    def __init__(self, fp):
+        self.s = _Stream(fp)
+        self.columns = {}
+        self.categories = {}
+
+    def parse(self):
+        meta = self.value(())
+        if meta is _COLUMN:
+            meta = {}  # the whole file is one numeric array
+        elif not isinstance(meta, dict):
+            meta = {'value': meta}
+        return meta
+
+    def value(self, path, nested=False):
+        c = self.s.peek()
+        if c == '{':
+            return self.object(path)
+        if c == '[':
+            return self.array(path, nested)
+        return self.s.scalar()
+
+    def object(self, path):
+        s = self.s
+        s.expect('{')
+        obj = {}
+        if s.peek() == '}':
+            s.pos += 1
+            return obj
+        while True:
+            key = s.scalar()
+            s.expect(':')
+            value = self.value(path + (key,))
+            if value is not _COLUMN:
+                obj[key] = value
+            c = s.peek()
+            s.pos += 1
+            if c == '}':
+                return obj
+            if c != ',':
+                raise ValueError(f'unexpected {c!r} in object')
+
+    def array(self, path, nested=False):
+        # Numeric arrays nested directly inside another array are handed
+        # back to the parent, which decides between rows and columns.
+        s = self.s
+        s.expect('[')
+        c = s.peek()
+        items = []
+        if c == ']' or c == '-' or c.isdigit():
+            if c == ']':
+                s.pos += 1
+                col, done = array('d'), True
+            else:
+                col, done = s.numbers()
+            if done:
+                if nested:
+                    return col
+                self.store(path, col)
+                return _COLUMN
+            # not only numbers, e.g. [1, 2, "x"]: the rest value by value
+            items = _values(col)
+
+        while True:
+            items.append(self.value(path + (len(items),), nested=True))
+            c = s.peek()
+            s.pos += 1
+            if c == ']':
+                break
+            if c != ',':
+                raise ValueError(f'unexpected {c!r} in array')
+
+        if _is_rows(items):
+            self.store_rows(path, items)
+            return _COLUMN
+        if not all(isinstance(item, array) for item in items):
+            # mixed, e.g. [1, [2, 3]]: generic values, in place
+            return [_values(item) if isinstance(item, array) else item for item in items]
+        for i, item in enumerate(items):
+            self.store(path + (i,), item)
+        return _COLUMN if items else []
+
+    def store(self, path, col):
+        self.columns[_key(path)] = col
+
+    def store_rows(self, path, rows):
+        kind, repeat = _key(path)
+        for j, values in enumerate(zip(*rows)):
+            name = f'{kind}.{j}'
+            if any(isinstance(v, str) for v in values):
+                cats = sorted({v for v in values if isinstance(v, str)})
+                codes = {v: i for i, v in enumerate(cats)}
+                self.categories[name] = cats
+                col = array('i', (codes.get(v, -1) for v in values))
+            else:
+                col = array('d', (float('nan') if v is None else v for v in values))
+            self.columns[name, repeat] = col
+
+
+_COLUMN = object()
+ROW_MAX = 16
+
+
+def _values(col):
+    # A numeric column as generic values, null for NaN
+    return [None if x != x else x for x in col]
+
+
+def _is_rows(items):
+    # Short arrays of the same length, of scalars only
+    n = None
+    for item in items:
+        if isinstance(item, list):
+            if not all(x is None or isinstance(x, (int, float, str)) for x in item):
+                return False
+        elif not isinstance(item, array):
+            return False
+        if n is None:
+            n = len(item)
+        if len(item) != n or not 0 < n <= ROW_MAX:
+            return False
+    return n is not None
+
+
+def _key(path):
+    kind = '.'.join(str(p) for p in path if isinstance(p, str))
+    repeats = [p for p in path if isinstance(p, int)]
+    return kind, (repeats[-1] if repeats else 0)
+
+
+def parse(fp):
+    p = _Parser(fp)
+    meta = p.parse()
+    return Results(meta, p.columns, p.categories)
+
+
+# Sidecar cache
+# =============
+
+def write_columns(fn, meta, columns, categories=None, source=None):
+    # Layout: MAGIC, u64 header length, JSON header, 8-byte aligned columns
+    descs = []
+    offset = 0
+    for (kind, repeat), col in columns.items():
+        col = memoryview(col)
+        nbytes = col.nbytes
+        descs.append({
+            'kind': kind,
+            'repeat': repeat,
+            'typecode': col.format,
+            'offset': offset,
+            'count': len(col),
+        })
+        offset += -(-nbytes // ALIGN) * ALIGN
+    header = {
+        'byteorder': sys.byteorder,
+        'meta': meta,
+        'categories': categories or {},
+        'source': source,
+        'columns': descs,
+    }
+    raw = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    raw += b' ' * (-len(raw) % ALIGN)
+
+    tmp = f'{fn}.tmp{os.getpid()}'
+    with open(tmp, 'wb') as fp:
+        fp.write(MAGIC)
+        fp.write(struct.pack('<Q', len(raw)))
+        fp.write(raw)
+        for col in columns.values():
+            b = memoryview(col).cast('B')
+            fp.write(b)
+            fp.write(b'\x00' * (-len(b) % ALIGN))
+    os.replace(tmp, fn)
+
+
+def read_columns(fn):
+    with open(fn, 'rb') as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{fn}: not a column file')
+        [n] = struct.unpack('<Q', fp.read(8))
+        header = json.loads(fp.read(n).decode('utf-8'))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f'{fn}: byte order mismatch')
+        start = len(MAGIC) + 8 + n
+        if os.fstat(fp.fileno()).st_size == start:
+            mm = None
+        else:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    columns = {}
+    for d in header['columns']:
+        tc = d['typecode']
+        if d['count'] == 0:
+            col = array(tc)
+        else:
+            lo = start + d['offset']
+            col = memoryview(mm)[lo:lo + d['count'] * array(tc).itemsize].cast(tc)
+        columns[d['kind'], d['repeat']] = col
+    return Results(header['meta'], columns, header['categories'], header['source'])
+
+
+def _fingerprint(fn):
+    st = os.stat(fn)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def load(fn, cache=True):
+    src = _fingerprint(fn)
+    sidecar = fn + SIDECAR_SUFFIX
+    if cache:
+        try:
+            res = read_columns(sidecar)
+            if res.source == src:
+                return res
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with open(fn, encoding='utf-8') as fp:
+        res = parse(fp)
+    res.source = src
+    if cache:
+        try:
+            write_columns(sidecar, res.meta, res.columns, res.categories, src)
+        except OSError:
+            pass
+    return res
+
+
+def load_many(fns, cache=True):
+    # (crdt, dataset, kind, repeat) -> column, for every file in fns
+    table = {}
+    for fn in fns:
+        table.update(load(fn, cache=cache).items())
+    return table
+
+
+def load_host(fn):
+    # The host metrics sampled while `fn` was written, {field: array}, or
+    # None if there are none
+    import numpy as np
+    try:
+        with open(fn + HOST_SUFFIX) as fp:
+            series = json.load(fp)
+    except FileNotFoundError:
+        return None
+    return {k: np.array([np.nan if x is None else x for x in v], dtype=np.float64)
+            for k, v in series.items()}
+
+
+def as_numpy(col):
+    import numpy as np
+    return np.frombuffer(col, dtype=memoryview(col).format)
@@ -0,0 +1,188 @@
+# Batched summary statistics over many sample arrays at once.
+#
+# Every group (e.g. one (crdt, dataset, kind) cell with all of its repeats)
+# is concatenated into one flat float64 vector, so that means, deviations,
+# extrema and percentiles for *all* groups come out of a handful of NumPy
+# calls instead of one Python loop per group. Percentiles use the same
+# linear interpolation as quantileSorted() in crunch/utils.js.
+import math
+import warnings
+
+import numpy as np
+
+
+PERCENTILES = (0.50, 0.90, 0.99, 0.999)
+
+
+def _name(p):
+    return 'p' + f'{p * 100:g}'.replace('.', '_')
+
+
+def flatten(groups):
+    # groups: {key: array or [array, ...]}
+    # returns (keys, values, starts, counts)
+    keys = list(groups)
+    parts = []
+    counts = np.zeros(len(keys), dtype=np.int64)
+    for i, key in enumerate(keys):
+        arrs = groups[key]
+        if not isinstance(arrs, (list, tuple)):
+            arrs = [arrs]
+        for a in arrs:
+            a = np.asarray(a, dtype=np.float64)
+            a = a[~np.isnan(a)]
+            parts.append(a)
+            counts[i] += len(a)
+    values = np.concatenate(parts) if parts else np.zeros(0)
+    starts = np.zeros(len(keys), dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    return keys, values, starts, counts
+
+
+def _segment_sum(values, starts, counts):
+    # np.add.reduceat misbehaves for empty segments, mask them out
+    out = np.zeros(len(starts))
+    nz = counts > 0
+    if nz.any():
+        out[nz] = np.add.reduceat(values, starts[nz])
+    return out
+
+
+def describe(groups, percentiles=PERCENTILES):
+    # Returns {key: {'count', 'sum', 'mean', 'std', 'min', 'max', 'p50', ...}}
+    keys, values, starts, counts = flatten(groups)
+    n = len(keys)
+    if n == 0:
+        return {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sums = _segment_sum(values, starts, counts)
+        means = sums / counts
+        dev = values - np.repeat(means, counts)
+        sq = _segment_sum(dev * dev, starts, counts)
+        std = np.sqrt(sq / (counts - 1))
+        std[counts < 2] = np.nan
+
+    # sort every segment in one go: order by (group, value)
+    gid = np.repeat(np.arange(n), counts)
+    srt = values[np.lexsort((values, gid))]
+    last = starts + counts - 1
+    empty = counts == 0
+    safe_lo = np.where(empty, 0, starts)
+    safe_hi = np.where(empty, 0, last)
+
+    cols = {
+        'count': counts,
+        'sum':   sums,
+        'mean':  means,
+        'std':   std,
+        'min':   np.where(empty, np.nan, srt[safe_lo] if len(srt) else np.nan),
+        'max':   np.where(empty, np.nan, srt[safe_hi] if len(srt) else np.nan),
+    }
+    for p in percentiles:
+        cols[_name(p)] = _quantile_sorted(srt, starts, counts, p)
+
+    return {key: {k: v[i].item() for k, v in cols.items()}
+            for i, key in enumerate(keys)}
+
+
+def _quantile_sorted(srt, starts, counts, p):
+    out = np.full(len(starts), np.nan)
+    nz = counts > 0
+    if not nz.any():
+        return out
+    pos = (counts[nz] - 1) * p
+    i0 = np.floor(pos).astype(np.int64)
+    i1 = np.minimum(i0 + 1, counts[nz] - 1)
+    v0 = srt[starts[nz] + i0]
+    v1 = srt[starts[nz] + i1]
+    out[nz] = v0 + (v1 - v0) * (pos - i0)
+    return out
+
+
+def stack(arrays):
+    # Stack (possibly ragged) repeats into a (repeats, ops) matrix, padding
+    # with NaN, e.g. when a repeat hit the time limit before the others.
+    arrays = [np.asarray(a, dtype=np.float64) for a in arrays]
+    width = max((len(a) for a in arrays), default=0)
+    out = np.full((len(arrays), width), np.nan)
+    for i, a in enumerate(arrays):
+        out[i, :len(a)] = a
+    return out
+
+
+def per_op_median(arrays):
+    # Median over repeats for every op index
+    m = stack(arrays)
+    if m.size == 0:
+        return np.zeros(0)
+    with warnings.catch_warnings():
+        # all-NaN columns (no repeat got that far) are expected
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(m, axis=0)
+
+
+def bootstrap_ci(samples, stat='mean', n_boot=1000, alpha=0.05,
+                 seed=0, max_cells=1 << 24):
+    # Percentile bootstrap confidence interval of `stat` ('mean' or
+    # 'median'). Resamples are drawn as an (n_boot, n) index matrix,
+    # in batches so that at most `max_cells` indices are live at once.
+    x = np.asarray(samples, dtype=np.float64)
+    x = x[~np.isnan(x)]
+    n = len(x)
+    if n == 0:
+        return (np.nan, np.nan)
+    fn = {'mean': np.mean, 'median': np.median}[stat]
+    rng = np.random.default_rng(seed)
+    batch = max(1, min(n_boot, max_cells // n))
+    est = np.empty(n_boot)
+    done = 0
+    while done < n_boot:
+        b = min(batch, n_boot - done)
+        idx = rng.integers(0, n, size=(b, n))
+        est[done:done + b] = fn(x[idx], axis=1)
+        done += b
+    lo, hi = np.quantile(est, [alpha / 2, 1 - alpha / 2])
+    return (lo.item(), hi.item())
+
+
+def bootstrap_many(groups, stat='mean', n_boot=1000, alpha=0.05, seed=0):
+    # bootstrap_ci() for every group, {key: (lo, hi)}
+    keys, values, starts, counts = flatten(groups)
+    return {key: bootstrap_ci(values[s:s + c], stat, n_boot, alpha, seed)
+            for key, s, c in zip(keys, starts, counts)}
+
+
+def mann_whitney(x, y):
+    # Two-sided Mann-Whitney U test of x against y, with the normal
+    # approximation (tie and continuity corrected), which is what the
+    # sample sizes here (thousands of ops) call for. Returns (U of x, p).
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x = x[~np.isnan(x)]
+    y = y[~np.isnan(y)]
+    n1, n2 = len(x), len(y)
+    if n1 == 0 or n2 == 0:
+        return np.nan, np.nan
+    values, inv, counts = np.unique(np.concatenate([x, y]),
+                                    return_inverse=True, return_counts=True)
+    avg_rank = np.cumsum(counts) - (counts - 1) / 2
+    u = avg_rank[inv[:n1]].sum() - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    ties = (counts.astype(np.float64) ** 3 - counts).sum()
+    var = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))) if n > 1 else 0
+    if var <= 0:
+        return u.item(), 1.0
+    d = u - n1 * n2 / 2
+    z = (abs(d) - 0.5) / math.sqrt(var) if abs(d) >= 0.5 else 0.0
+    return u.item(), math.erfc(z / math.sqrt(2))
+
+
+def holm(pvalues):
+    # Holm-Bonferroni adjusted p-values, in the given order
+    p = np.asarray(pvalues, dtype=np.float64)
+    m = len(p)
+    order = np.argsort(p)
+    adj = np.minimum(1, np.maximum.accumulate((m - np.arange(m)) * p[order]))
+    out = np.empty(m)
+    out[order] = adj
+    return out
@@ -0,0 +1,68 @@
+import io
+import json
+import random
+
+import pytest
+
+from analysis import results
+
+
+def replay_like(seed=1):
+    # Shaped like the output of bench/replay-causal-traces.js and
+    # bench/linear-time.js, with numbers of all forms
+    rng = random.Random(seed)
+    def number():
+        return rng.choice([rng.random() * 10, rng.randint(0, 999), -rng.random(),
+                           rng.random() * 1e-7, float(rng.randint(1, 9) * 10 ** 21)])
+    return {
+        'configuration': {'crdt_name': 'RGA', 'log_file': 'x.json', 'repeats': 2,
+                          'host': {'interference': '', 'load1_mean': 0.25}},
+        'sizes': [rng.randint(1, 99) for _ in range(50)],
+        'samples': [{'run_times': [[rng.choice('LR'), i, number()] for i in range(40)],
+                     'enc_times': [None if i % 7 == 3 else number() for i in range(40)]}
+                    for _ in range(2)],
+        'local_samples': [{'run_times': [number() for _ in range(60)]} for _ in range(3)],
+        'memory_samples': [{'memory': [[number() for _ in range(20)] for _ in range(20)]}],
+    }
+
+
+def parse(text, chunk_size, monkeypatch):
+    monkeypatch.setattr(results, 'CHUNK_SIZE', chunk_size)
+    return results.parse(io.StringIO(text))
+
+
+def columns(r):
+    # NaN (null) compares unequal to itself
+    return {key: results._values(col) for key, col in r.columns.items()}
+
+
+def test_chunk_boundaries(monkeypatch):
+    data = replay_like()
+    text = json.dumps(data, indent=1)
+    whole = parse(text, len(text) + 1, monkeypatch)
+    assert whole.meta['configuration'] == data['configuration']
+    assert list(whole.get('sizes')) == data['sizes']
+    for i, sample in enumerate(data['local_samples']):
+        assert list(whole.get('local_samples.run_times', i)) == sample['run_times']
+    for i, sample in enumerate(data['samples']):
+        assert list(whole.get('samples.run_times.2', i)) == [t for _, _, t in sample['run_times']]
+        assert results._values(whole.get('samples.enc_times', i)) == sample['enc_times']
+    for chunk_size in range(1, 24):
+        r = parse(text, chunk_size, monkeypatch)
+        assert r.meta == whole.meta
+        assert columns(r) == columns(whole), chunk_size
+        assert r.categories == whole.categories
+
+
+@pytest.mark.parametrize('text', [
+    '{"a": [1, 2, "x"]}',
+    '{"a": [1, null, [2, 3]]}',
+    '{"a": [1, "x]y", 2.5]}',
+    '{"a": [[1, [2]], [3, [4]]]}',
+    '{"a": [[1, {"b": 2}], [3, {"b": 4}]]}',
+])
+def test_mixed_arrays(text, monkeypatch):
+    for chunk_size in (3, 1 << 20):
+        r = parse(text, chunk_size, monkeypatch)
+        assert r.meta == json.loads(text)
+        assert not r.columns
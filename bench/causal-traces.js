@@ -6,8 +6,9 @@ const process = require('process')
 const seedrandom = require('seedrandom')
 const MockDate = require('mockdate')
 
-const { record, saveLogs } = require('./utils')
+const { record, saveLogs, progress } = require('./utils')
 const VC = require('../vector-clock')
+const { decodeCausal } = require('../crunch/vclock')
 const uconf = require('./uconf')
 const {
     NO_PEER,
@@ -107,6 +108,7 @@ function* generateOps(crdt_name, prefix, ctxs, trace) {
         globalVc = VC.merge(globalVc, vc)
         MockDate.reset()
         i++
+        progress(i, trace.length)
     }
 
     // execute remainder
@@ -194,7 +196,7 @@ function main() {
     const crdtName = options['crdt_name']
     const dataName = options['data_name']
     const prefix = `${crdtName}-${path.basename(dataName)}`
-    const trace = JSON.parse(fs.readFileSync(dataName))
+    const trace = decodeCausal(JSON.parse(fs.readFileSync(dataName)))
     const cfg = uconf[crdtName]()
     const get_ctx = make_get_ctx(crdtName)
 
@@ -7,7 +7,7 @@ const seedrandom = require('seedrandom')
 const MockDate = require('mockdate')
 
 const uconf = require('./uconf')
-const { dmpToSplice } = require('./utils')
+const { dmpToSplice, progress } = require('./utils')
 const {
     readOrder,
     loadDoc,
@@ -82,6 +82,7 @@ async function* generateOps(ctx, order) {
 
     for (let i = 0; i < order.length; i++) {
         const item = order[i]
+        progress(i, order.length)
         console.log(`${i+1}/${order.length}`, item.author_key, item.commit.slice(0,10), item.deps.map(x => x.slice(0,10)))
         const id = ids.get(item.author_key)
         let doc = loadDoc(ctx, id)
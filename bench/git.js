@@ -6,7 +6,7 @@ const process = require('process')
 const path = require('path')
 const seedrandom = require('seedrandom')
 
-const { dmpToSplice } = require('./utils')
+const { dmpToSplice, progress } = require('./utils')
 const uconf = require('./uconf')
 
 const { NO_PEER } = require('./ctx_utils')
@@ -65,6 +65,7 @@ async function* generateOps(ctx, order) {
 
     for (let i = 0; i < order.length; i++) {
         const item = order[i]
+        progress(i, order.length)
         console.log(`${i+1}/${order.length}`, item.author_key, item.commit.slice(0,10), item.deps.map(x => x.slice(0,10)))
         const peer = peers.get(item.author_key)
         const logical_id = reverse_ids.get(peer.id)
@@ -15,6 +15,7 @@ const {
     apply_local,
     apply_remote,
 } = require('./ctx_utils')
+const { adaptiveRepeat } = require('./utils')
 
 
 function setup() {
@@ -163,7 +164,7 @@ function get_data(data_name) {
 }
 
 
-function run_benchmarks(data_name, time_limit, crdt_name, repeats, quick) {
+function run_benchmarks(data_name, time_limit, crdt_name, repeats, mem_repeats, quick, adaptive) {
     const data = get_data(data_name)
     const get_ctx = make_get_ctx(crdt_name)
 
@@ -188,6 +189,10 @@ function run_benchmarks(data_name, time_limit, crdt_name, repeats, quick) {
         [ops_ran, total] = benchmark_local(get_ctx, data, res, time_limit)
         max_ops = Math.max(ops_ran, max_ops)
         console.error(`Local [${n}] (${ops_ran}, ${total.toFixed(2)} ms)`)
+        if (adaptive && !adaptiveRepeat(n, repeats, res.run_times.slice(0, ops_ran))) {
+            repeats = n  // as many remote repeats
+            break
+        }
     }
     fmt.end('local_samples', 'Array')
 
@@ -216,7 +221,7 @@ function run_benchmarks(data_name, time_limit, crdt_name, repeats, quick) {
     res.memory = new Array(1 + Math.ceil(max_ops / 1000)).fill(0)
 
     fmt.begin('memory_samples', 'Array')
-    for (let n = 1; n <= 5; n++) {
+    for (let n = 1; n <= mem_repeats; n++) {
         const total = benchmark_memory(get_ctx, data, res, max_ops)
         console.error(`Memory [${n}] (${total.toFixed(2)} ms)`)
     }
@@ -227,19 +232,22 @@ function run_benchmarks(data_name, time_limit, crdt_name, repeats, quick) {
 
 function main() {
     const options = getopts(process.argv.slice(2), {
-        boolean: ['quick'],
+        boolean: ['quick', 'adaptive'],
         alias: {
             'time_limit': 'T',
             'crdt_name': 'c',
             'data_name': 'd',
             'repeats': 'n',
+            'mem_repeats': 'm',
         },
         default: {
             'time_limit': '600', // 10 minutes
             'crdt_name': 'RGA',
             'data_name': 'microLTR',
             'repeats': '5',
+            'mem_repeats': '5',
             'quick': false,
+            'adaptive': false,
         }
     })
     console.error(
@@ -251,7 +259,9 @@ function main() {
         parseInt(options['time_limit'], 10),
         options['crdt_name'],
         parseInt(options['repeats'], 10),
+        parseInt(options['mem_repeats'], 10),
         options['quick'],
+        options['adaptive'],
     )
 }
 
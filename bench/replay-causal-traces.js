@@ -6,7 +6,7 @@ const seedrandom = require('seedrandom')
 const MockDate = require('mockdate')
 
 const fmt = new (require('./format'))()
-const { iter_lines } = require('./utils')
+const { iter_lines, progress, adaptiveRepeat } = require('./utils')
 const { getHeapUsed } = require('../crunch/utils')
 const {
     make_get_ctx,
@@ -96,7 +96,7 @@ function replay(get_ctx, fn, res, run_gc) {
 
 function main() {
     const options = getopts(process.argv.slice(2), {
-        boolean: ['memory', 'run_gc'],
+        boolean: ['memory', 'run_gc', 'adaptive'],
         alias: {
             'log_file': 'f',
             'crdt_name': 'c',
@@ -130,9 +130,13 @@ function main() {
         res.memory = []
 
     fmt.begin('samples', 'Array')
+    progress(0, repeats)
     for (let n = 1; n <= repeats; n++) {
         const total = replay(() => get_ctx(id), fn, res, options['run_gc'])
         console.error(`Run ${n} (${total.toFixed(2)} ms)`)
+        progress(n, repeats)
+        if (options['adaptive'] && !adaptiveRepeat(n, repeats, res.run_times))
+            break
     }
     fmt.end('samples', 'Array')
     fmt.close()
@@ -6,7 +6,7 @@ const seedrandom = require('seedrandom')
 
 const fmt = new (require('./format'))()
 // const { causalOrder } = require('./git-utils')
-const { iter_lines } = require('./utils')
+const { iter_lines, progress, adaptiveRepeat } = require('./utils')
 const {
     NO_PEER,
     make_get_ctx,
@@ -106,6 +106,7 @@ function replay(ctx, fn, res) {
 
 function main() {
     const options = getopts(process.argv.slice(2), {
+        boolean: ['adaptive'],
         alias: {
             'log_file': 'f',
             'crdt_name': 'c',
@@ -136,9 +137,13 @@ function main() {
     const res = {times: []}
 
     fmt.begin('samples', 'Array')
+    progress(0, repeats)
     for (let n = 1; n <= repeats; n++) {
         const total = replay(get_ctx(id), fn, res)
         console.error(`Run ${n} (${total.toFixed(2)} ms)`)
+        progress(n, repeats)
+        if (options['adaptive'] && !adaptiveRepeat(n, repeats, res.times))
+            break
     }
     fmt.end('samples', 'Array')
     fmt.close()
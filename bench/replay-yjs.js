@@ -6,7 +6,7 @@ const seedrandom = require('seedrandom')
 
 const Y = require('yjs')
 const fmt = new (require('./format'))()
-const { iter_lines } = require('./utils')
+const { iter_lines, progress, adaptiveRepeat } = require('./utils')
 const {
     make_get_ctx,
     cleanup,
@@ -72,6 +72,7 @@ function replay(ctx, fn, res) {
 
 function main() {
     const options = getopts(process.argv.slice(2), {
+        boolean: ['adaptive'],
         alias: {
             'log_file': 'f',
             'id': 'i',
@@ -99,9 +100,13 @@ function main() {
     const res = {times: []}
 
     fmt.begin('samples', 'Array')
+    progress(0, repeats)
     for (let n = 1; n <= repeats; n++) {
         const total = replay(get_ctx(id), fn, res)
         console.error(`Run ${n} (${total.toFixed(2)} ms)`)
+        progress(n, repeats)
+        if (options['adaptive'] && !adaptiveRepeat(n, repeats, res.times))
+            break
     }
     fmt.end('samples', 'Array')
     fmt.close()
@@ -1,8 +1,7 @@
 const assert = require('assert')
 const fs = require('fs')
 const path = require('path')
-const {sortAsc, median, quantileSorted} = require('../crunch/utils')
-const lineByLine = require('n-readlines')
+const {sortAsc, median, quantileSorted, iter_lines} = require('../crunch/utils')
 
 function record(name, data) {
     fs.writeFileSync(name, JSON.stringify(data));
@@ -95,27 +94,36 @@ function summarize(arr) {
 }
 
 
-function iter_lines(fn, parse=true) {
-    return {
-        liner: new lineByLine(fn),
-        [Symbol.iterator]() {
-            return this;
-        },
-        next() {
-            let line = this.liner.next()
-            if (!line)
-                return {done: true}
-            line = line.toString().trimEnd()
-            if (line.length === 0)
-                return {done: true}
-            return {value: parse ? JSON.parse(line) : line}
-        },
-        return() {
-            if (this.liner.fd !== null)
-                this.liner.close()
-            return {done:true}
-        },
-    }
+// Reports `done` of `total` units of work on stderr, at most once per
+// PROGRESS_EVERY ms, for scripts/runner.py to abort jobs that cannot finish
+// in time (see scripts/predict.py)
+const PROGRESS_EVERY = 1000
+let lastProgress = -Infinity
+function progress(done, total) {
+    const now = Date.now()
+    if (now - lastProgress < PROGRESS_EVERY && done !== 0 && done !== total)
+        return
+    lastProgress = now
+    console.error(`[progress] ${done}/${total} ${process.uptime().toFixed(3)}`)
+}
+
+
+// With --adaptive, scripts/adaptive.py decides how many of the `total`
+// repeats to run, all in this process: after repeat `done` the median of
+// its per-op `times` (numbers, or rows with the time last) is reported on
+// stderr, and unless it was the last, `more` or `stop` is read from stdin.
+// Returns whether to run another repeat.
+function adaptiveRepeat(done, total, times) {
+    const values = times.map(x => Array.isArray(x) ? x[x.length - 1] : x)
+                        .filter(x => x != null)
+    console.error(`[adaptive] ${done} ${values.length ? median(sortAsc(values)) : NaN}`)
+    if (done >= total)
+        return false
+    const buf = Buffer.alloc(1)
+    let line = ''
+    while (fs.readSync(0, buf, 0, 1) === 1 && buf[0] !== 10)
+        line += String.fromCharCode(buf[0])
+    return line.trim() === 'more'
 }
 
 
@@ -135,4 +143,6 @@ module.exports = {
     summarize,
     iter_lines,
     sleep,
+    progress,
+    adaptiveRepeat,
 };
@@ -0,0 +1,60 @@
+// Reader for compact (run-length) linear traces.
+// See scripts/ctrace.py for the file format. Frames are read from disk one
+// revision at a time, and runs are expanded lazily into the same per-char
+// splice ops as the JSON traces:
+//
+//   insert run (idx, text)  => [idx, 0, ch0], [idx+1, 0, ch1], ...
+//   delete run (idx, count) => [idx+count-1, 1], ..., [idx, 1]
+
+const fs = require('fs')
+
+const MAGIC = Buffer.from('CTRACE\x00\x01', 'latin1')
+
+
+function* expandRuns(payload) {
+    const n = payload.readUInt32LE(0)
+    let pos = 4
+    for (let r = 0; r < n; r++) {
+        const t   = payload.readUInt8(pos)
+        let idx   = payload.readUInt32LE(pos + 1)
+        const x   = payload.readUInt32LE(pos + 5)
+        pos += 9
+        if (t === 0) {
+            const text = payload.toString('utf8', pos, pos + x)
+            pos += x
+            for (const ch of text) {
+                yield [idx, 0, ch]
+                idx++
+            }
+        } else {
+            for (let i = x - 1; i >= 0; i--)
+                yield [idx + i, 1]
+        }
+    }
+}
+
+
+// Yields one generator of ops per revision
+function* readRevisions(fn) {
+    const fd = fs.openSync(fn, 'r')
+    try {
+        const head = Buffer.alloc(MAGIC.length)
+        fs.readSync(fd, head, 0, head.length, null)
+        if (!head.equals(MAGIC))
+            throw new Error(`${fn}: not a compact trace`)
+        const len = Buffer.alloc(4)
+        while (fs.readSync(fd, len, 0, 4, null) === 4) {
+            const payload = Buffer.alloc(len.readUInt32LE(0))
+            fs.readSync(fd, payload, 0, payload.length, null)
+            yield expandRuns(payload)
+        }
+    } finally {
+        fs.closeSync(fd)
+    }
+}
+
+
+module.exports = {
+    expandRuns,
+    readRevisions,
+}
@@ -2,6 +2,8 @@
 
 const fs = require('fs');
 const seedrandom = require('seedrandom')
+const ctrace = require('./ctrace')
+const { iter_lines } = require('./utils')
 
 //
 // Linear traces
@@ -73,14 +75,28 @@ function automerge(n) {
 // Each mini-trace contains a list of edits.
 // Each edit is: [index, type, ch],
 // same format as automerge-perf's JSON trace.
+//
+// If there is a compact trace (`.wiki-traces/${title}.ct`, written by
+// `revs2trace --compact`) it is used instead, see crunch/ctrace.js, or else
+// a line-delimited one (`${title}.ndjson`, `revs2trace --ndjson`), which is
+// parsed one revision at a time.
+
+function wikiRevisions(title) {
+    const compact = `.wiki-traces/${title}.ct`
+    if (fs.existsSync(compact))
+        return ctrace.readRevisions(compact)
+    const ndjson = `.wiki-traces/${title}.ndjson`
+    if (fs.existsSync(ndjson))
+        return iter_lines(ndjson)
+    return JSON.parse(fs.readFileSync(`.wiki-traces/${title}`));
+}
 
 function wikiLinear(title, n) {
     // Return up to n _operations_
-    const tracesByRev = JSON.parse(fs.readFileSync(`.wiki-traces/${title}`));
     const trace = []
     const sample = []
     let stop = false
-    for (let t of tracesByRev) {
+    for (let t of wikiRevisions(title)) {
         for (let edit of t) {
             trace.push(edit)
             sample.splice(...edit)
@@ -97,15 +113,15 @@ function wikiLinear(title, n) {
 
 function wikiLinearRevs(title, n) {
     // Return operations from to n _traces_
-    const tracesByRev = JSON.parse(fs.readFileSync(`.wiki-traces/${title}`));
     const trace = []
     const sample = []
-    for (let i = 0; i < tracesByRev.length; i++) {
-        for (let edit of tracesByRev[i]) {
+    let i = 0
+    for (let t of wikiRevisions(title)) {
+        for (let edit of t) {
             trace.push(edit)
             sample.splice(...edit)
         }
-        if (i+1 === n)
+        if (++i === n)
             break
     }
     return { trace, text: sample.join('') }
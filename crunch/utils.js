@@ -1,5 +1,6 @@
 const assert = require('assert');
 const process = require('process');
+const lineByLine = require('n-readlines');
 
 function sortAsc(values) {
     values.sort((a, b) => {
@@ -41,10 +42,36 @@ function getHeapUsed(gc) {
     return process.memoryUsage().heapUsed;
 }
 
+// Lines of a file, parsed as JSON by default, up to the first empty line
+function iter_lines(fn, parse=true) {
+    return {
+        liner: new lineByLine(fn),
+        [Symbol.iterator]() {
+            return this;
+        },
+        next() {
+            let line = this.liner.next()
+            if (!line)
+                return {done: true}
+            line = line.toString().trimEnd()
+            if (line.length === 0)
+                return {done: true}
+            return {value: parse ? JSON.parse(line) : line}
+        },
+        return() {
+            if (this.liner.fd !== null)
+                this.liner.close()
+            return {done:true}
+        },
+    }
+}
+
+
 module.exports = {
     getHeapUsed,
     BigInt,
     sortAsc,
     quantileSorted,
     median: (v) => quantileSorted(v, 0.5),
+    iter_lines,
 };
@@ -0,0 +1,51 @@
+// Decoder for the compact vector clocks of causal traces.
+// See `--vc` in scripts/xmltrace2json. A plain array is a trace with full
+// clocks; otherwise the trace is { vc: 'delta' | 'dense', ops: [...] } and
+// every op's clock is expanded back to a full { replica: clock } object.
+
+
+function decodeDelta(ops) {
+    const last = new Map()
+    for (const op of ops) {
+        const [author, d] = op
+        const vc = Object.assign({}, last.get(author))
+        for (const key of Object.keys(d)) {
+            if (d[key] === null)
+                delete vc[key]
+            else
+                vc[key] = d[key]
+        }
+        last.set(author, vc)
+        op[1] = vc
+    }
+    return ops
+}
+
+
+function decodeDense(ops) {
+    for (const op of ops) {
+        const vc = {}
+        op[1].forEach((c, i) => {
+            if (c !== 0)
+                vc[i + 1] = c
+        })
+        op[1] = vc
+    }
+    return ops
+}
+
+
+function decodeCausal(data) {
+    if (Array.isArray(data))
+        return data
+    if (data.vc === 'delta')
+        return decodeDelta(data.ops)
+    if (data.vc === 'dense')
+        return decodeDense(data.ops)
+    throw new Error(`unknown clock encoding: ${data.vc}`)
+}
+
+
+module.exports = {
+    decodeCausal,
+}
@@ -1,10 +1,10 @@
-import json
-from statistics import stdev, mean
 from tabulate import tabulate
 
+from analysis import results, stats
+
 
 def load(fn):
-    return json.load(open(fn))
+    return results.load(fn)
 
 
 algs = [
@@ -25,43 +25,39 @@ datas = [
     'wikipedia.json',
     'united-states.json',
 ]
+kinds = ['local', 'remote']
 
 
+# Load every sample array first, then summarise all of them in one pass.
+groups = {}
 for data in datas:
-    l_data = [['Name', 'Avg', 'Max', 'Variance', 'Sum']]
-    r_data = [['Name', 'Avg', 'Max', 'Variance', 'Sum']]
-
     for name in algs:
-        l_times = load(f'res/{name}-{data}-25k-local')['times']
-        r_times = load(f'res/{name}-{data}-25k-remote')['times']
+        for kind in kinds:
+            groups[data, name, kind] = load(f'res/{name}-{data}-25k-{kind}').repeats('times')
+summary = stats.describe(groups)
 
-        # local
-        l_max = max(l_times)
-        l_sig = stdev(l_times)
-        l_avg = mean(l_times)
-        l_sum = sum(l_times)
-        l_data.append([
-            name,
-            round(l_avg, 2),
-            round(l_max, 2),
-            round(l_sig, 2),
-            round(l_sum, 2),
-        ])
 
-        # remote
-        r_max = max(r_times)
-        r_sig = stdev(r_times)
-        r_avg = mean(r_times)
-        r_sum = sum(r_times)
-        r_data.append([
-            name,
-            r_avg,
-            r_max,
-            r_sig,
-            r_sum,
-        ])
+for data in datas:
+    tables = {}
+    for kind in kinds:
+        rows = [['Name', 'Avg', 'Max', 'Variance', 'Sum', 'P50', 'P99']]
+        for name in algs:
+            s = summary[data, name, kind]
+            rows.append([
+                name,
+                round(s['mean'], 2),
+                round(s['max'], 2),
+                round(s['std'], 2),
+                round(s['sum'], 2),
+                round(s['p50'], 2),
+                round(s['p99'], 2),
+            ])
+        tables[kind] = rows
+
     print()
     print('=======')
     print()
     print(data)
-    print(tabulate(l_data, headers='firstrow', tablefmt='latex'))
+    for kind in kinds:
+        print(kind)
+        print(tabulate(tables[kind], headers='firstrow', tablefmt='latex'))
@@ -0,0 +1,139 @@
+# Adaptive number of repeats for a benchmark (`gen-jobs.py --adaptive`).
+#
+# Instead of a fixed `-n`, the benchmark runs with `--adaptive` and `-n` as
+# the most repeats: all repeats run in the same node process, as with a
+# fixed `-n`, so the JIT is warmed up only once. After every repeat the
+# benchmark reports the median of its per-op times on stderr
+# (adaptiveRepeat() in bench/utils.js) and waits for `more` or `stop`:
+#
+#   - leading repeats whose median per-op time is more than WARMUP above the
+#     median of the later ones are warm-up (cold caches, JIT, CPU clocking
+#     up), and are left out,
+#   - it stops once the bootstrap confidence interval of the median over the
+#     remaining repeats is narrower than `--width` (relative to the median),
+#     or when `--max` repeats are done, or the next one would exceed
+#     `--budget`.
+#
+# The result is written as if run with `-n <steady repeats>`: the warm-up
+# repeats are dropped from the MERGE arrays (bench/linear-time.js runs as
+# many remote repeats as local ones, and its memory benchmark once). The
+# `configuration` block records the achieved precision under `adaptive`.
+#
+#   $ python3 scripts/adaptive.py --max 11 -o res2/RGA-Jesus -- \
+#         node --expose-gc bench/linear-time.js -c RGA -d Jesus
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time as _time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from analysis import stats  # noqa: E402
+
+
+MERGE = ['local_samples', 'remote_samples', 'samples']
+WARMUP = 0.10
+REPORT = re.compile(rb'^\[adaptive\] (\d+) (\S+)$')
+
+
+def warmup(medians):
+    # Number of leading warm-up repeats
+    k = 0
+    while k < len(medians) - 2 and medians[k] > (1 + WARMUP) * np.median(medians[k + 1:]):
+        k += 1
+    return k
+
+
+def precision(medians):
+    # (median, lo, hi, relative width) of the median over the repeats
+    med = np.median(medians).item()
+    lo, hi = stats.bootstrap_ci(medians, stat='median', n_boot=2000)
+    return med, lo, hi, (hi - lo) / med if med else np.inf
+
+
+def without_warmup(result, first):
+    # The result without the samples of the first `first` repeats
+    out = dict(result)
+    for key in MERGE:
+        if key in out:
+            out[key] = out[key][first:]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('--min', type=int, default=3, help='fewest repeats after warm-up')
+    parser.add_argument('--max', type=int, default=11, help='most repeats')
+    parser.add_argument('--width', type=float, default=0.02,
+                        help='target width of the 95%% CI of the median, relative to it')
+    parser.add_argument('--budget', type=float, default=float('inf'),
+                        help='seconds to spend in total')
+    parser.add_argument('cmd', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+
+    start = _time.monotonic()
+    medians = []
+    first, med, lo, hi, width = 0, np.nan, np.nan, np.nan, np.inf
+    stopped = 'max'
+    tmp = args.output + '.tmp'
+    with open(tmp, 'wb') as out:
+        proc = subprocess.Popen(cmd + ['-n', str(args.max), '--adaptive'],
+                                stdin=subprocess.PIPE, stdout=out, stderr=subprocess.PIPE)
+        for line in proc.stderr:
+            m = REPORT.match(line.rstrip(b'\n'))
+            if m is None:
+                sys.stderr.buffer.write(line)  # e.g. [progress] for scripts/predict.py
+                sys.stderr.flush()
+                continue
+            medians.append(float(m.group(2)))
+            first = warmup(medians)
+            steady = medians[first:]
+            med, lo, hi, width = precision(steady)
+            elapsed = _time.monotonic() - start
+            print(f'[adaptive] repeat {len(medians)}: median {medians[-1]:.4g},'
+                  f' {len(steady)} steady, CI width {width:.1%}', file=sys.stderr)
+            if int(m.group(1)) >= args.max:
+                break  # the benchmark does not ask after its last repeat
+            more = True
+            if len(steady) >= args.min and width <= args.width:
+                stopped, more = 'precision', False
+            elif elapsed + elapsed / len(medians) > args.budget:
+                stopped, more = 'budget', False
+            try:
+                proc.stdin.write(b'more\n' if more else b'stop\n')
+                proc.stdin.flush()
+            except BrokenPipeError:
+                pass  # it exited, the return code tells why
+        proc.stdin.close()
+        for line in proc.stderr:
+            sys.stderr.buffer.write(line)
+        if proc.wait() != 0:
+            raise SystemExit(proc.returncode)
+    with open(tmp) as fp:
+        result = without_warmup(json.load(fp), first)
+
+    conf = result.setdefault('configuration', {})
+    conf['repeats'] = len(medians) - first
+    conf['adaptive'] = {
+        'repeats':  len(medians),
+        'warmup':   first,
+        'median':   med,
+        'ci':       [lo, hi],
+        'width':    width if np.isfinite(width) else None,
+        'target':   args.width,
+        'stopped':  stopped,
+        'seconds':  _time.monotonic() - start,
+    }
+    with open(tmp, 'w') as fp:
+        json.dump(result, fp)
+    os.replace(tmp, args.output)
+
+
+if __name__ == '__main__':
+    main()
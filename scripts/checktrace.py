@@ -0,0 +1,286 @@
+# Replays traces to catch bad ones before they are benchmarked.
+#
+#   $ python scripts/checktrace.py .wiki-traces/Jesus            # linear (JSON)
+#   $ python scripts/checktrace.py .wiki-traces/Jesus.ct         # linear (compact)
+#   $ python scripts/checktrace.py .wiki-traces/Jesus.ndjson     # linear (NDJSON)
+#   $ python scripts/checktrace.py .causal-traces/doc1.json      # xmltrace2json
+#   $ python scripts/checktrace.py .causal-traces/jesus-10.json  # revs2causal
+#
+# The format is detected from the file. For every trace it reports the
+# number of revisions, ops and chars, every op whose position is out of
+# bounds (which is skipped), and the length and sha256 of the final text(s).
+# The exit status is 1 if there was any out-of-bounds op or mismatch.
+#
+# Linear traces are replayed on a rope (scripts/rope.py). Bounds only depend
+# on the length of the document, so they are checked per op on the length,
+# and the valid ops are coalesced into runs (scripts/ctrace.py) before being
+# applied, which keeps even the largest traces at a few seconds.
+#
+# revs2causal traces: every peer replays its ops of a revision on the
+# previous revision's content, and a peer that was assigned every change
+# has to end up with the revision's content.
+#
+# xmltrace2json traces: an op's position is relative to its author's
+# document, i.e. the ops in its causal past. Since every replica's ops are
+# sequential, that document's length is the sum of the length changes of the
+# first vc[r] ops of every replica r. That is exact while the trace is
+# sequential (every op has seen all previous ones), and the trace is then
+# also replayed. Once ops are concurrent, a char deleted by two replicas is
+# subtracted twice, so the length can be too low and valid ops look out of
+# bounds: those are only reported as warnings, and don't fail the check.
+import argparse
+import json
+import sys
+from collections import defaultdict
+from hashlib import sha256
+
+import ctrace
+from rope import Rope
+
+
+MAX_REPORTED = 20
+
+
+def sha(text):
+    return sha256(text.encode('utf-8')).hexdigest()
+
+
+class Report:
+    def __init__(self, fn, kind):
+        self.fn = fn
+        self.kind = kind
+        self.revisions = 0
+        self.ops = 0
+        self.chars = 0
+        self.out_of_bounds = 0
+        self.errors = []
+        self.suspicious = 0
+        self.warnings = []
+        self.texts = {}
+
+    def bad(self, msg):
+        self.out_of_bounds += 1
+        if len(self.errors) < MAX_REPORTED:
+            self.errors.append(msg)
+
+    def warn(self, msg):
+        self.suspicious += 1
+        if len(self.warnings) < MAX_REPORTED:
+            self.warnings.append(msg)
+
+    def mismatch(self, msg):
+        self.errors.append(msg)
+
+    def ok(self):
+        return not self.errors
+
+    def print(self, out=sys.stdout):
+        print(f'{self.fn}: {self.kind}', file=out)
+        print(f'  revisions:     {self.revisions}', file=out)
+        print(f'  ops:           {self.ops}', file=out)
+        print(f'  chars:         {self.chars}', file=out)
+        print(f'  out of bounds: {self.out_of_bounds}', file=out)
+        if self.suspicious:
+            print(f'  suspicious:    {self.suspicious}', file=out)
+        for name, text in self.texts.items():
+            print(f'  {name}: {len(text)} chars, sha256 {sha(text)}', file=out)
+        for msg in self.errors:
+            print(f'  ERROR {msg}', file=out)
+        if self.out_of_bounds > MAX_REPORTED:
+            print(f'  ... {self.out_of_bounds - MAX_REPORTED} more out of bounds', file=out)
+        for msg in self.warnings:
+            print(f'  WARN {msg}', file=out)
+        if self.suspicious > MAX_REPORTED:
+            print(f'  ... {self.suspicious - MAX_REPORTED} more suspicious', file=out)
+
+
+def checked_runs(ops, length, report, where):
+    # Bound-checks per-char splice ops against the document length, and
+    # returns the valid ones as runs plus the new length.
+    good = []
+    for i, op in enumerate(ops):
+        report.ops += 1
+        idx = op[0]
+        if op[1] == 0:
+            ok = 0 <= idx <= length
+            if ok:
+                length += len(op[2])
+                report.chars += len(op[2])
+        else:
+            ok = idx >= 0 and op[1] > 0 and idx + op[1] <= length
+            if ok:
+                length -= op[1]
+                report.chars += op[1]
+        if ok:
+            good.append(op)
+        else:
+            report.bad(f'{where} op {i}: {op} (length {length})')
+    return ctrace.coalesce(good), length
+
+
+def checked_ct_runs(runs, length, report, where):
+    good = []
+    for i, (t, idx, x) in enumerate(runs):
+        n = len(x) if t == 0 else x
+        report.ops += n
+        ok = (0 <= idx <= length) if t == 0 else (idx >= 0 and idx + x <= length)
+        if ok:
+            good.append((t, idx, x))
+            report.chars += n
+            length += n if t == 0 else -n
+        else:
+            report.bad(f'{where} run {i}: {(t, idx, x if t else len(x))} (length {length})')
+    return good, length
+
+
+def check_linear(revisions, report, compact=False):
+    doc = Rope()
+    for r, rev in enumerate(revisions):
+        report.revisions += 1
+        check = checked_ct_runs if compact else checked_runs
+        runs, _ = check(rev, len(doc), report, f'revision {r}')
+        ctrace.apply(doc, runs)
+    report.texts['final'] = str(doc)
+
+
+def check_revs2causal(items, num_peers, report):
+    prev = ''
+    for r, item in enumerate(items):
+        report.revisions += 1
+        by_peer = defaultdict(list)
+        for peer, op in item['trace']:
+            by_peer[peer].append(op)
+        for peer, ops in sorted(by_peer.items()):
+            if not 1 <= peer <= num_peers:
+                report.mismatch(f'revision {r}: unknown peer {peer}')
+            doc = Rope(prev)
+            runs, _ = checked_runs(ops, len(doc), report, f'revision {r} peer {peer}')
+            ctrace.apply(doc, runs)
+            if len(by_peer) == 1 and str(doc) != item['content']:
+                report.mismatch(f'revision {r}: peer {peer} has every change but'
+                                f' not the content (sha256 {sha(str(doc))})')
+        if not by_peer and prev != item['content']:
+            report.mismatch(f'revision {r}: no ops but the content changed')
+        prev = item['content']
+    report.texts['final'] = prev
+
+
+def decoded_clocks(data):
+    # Full {replica: clock} dicts for every encoding of xmltrace2json --vc
+    if isinstance(data, list):
+        return data
+    ops = data['ops']
+    if data['vc'] == 'dense':
+        for op in ops:
+            op[1] = {str(r): c for r, c in enumerate(op[1], 1) if c}
+    elif data['vc'] == 'delta':
+        last = {}
+        for op in ops:
+            vc = dict(last.get(op[0], {}))
+            for k, c in op[1].items():
+                if c is None:
+                    vc.pop(k, None)
+                else:
+                    vc[k] = c
+            last[op[0]] = op[1] = vc
+    return ops
+
+
+def is_causal(data):
+    # xmltrace2json: {"vc": ..., "ops": [...]} or [[author, {clock}, edit], ...]
+    if isinstance(data, dict):
+        return 'vc' in data and 'ops' in data
+    head = data[0] if data else None
+    return isinstance(head, list) and len(head) == 3 and isinstance(head[1], dict)
+
+
+def check_causal(ops, report):
+    # deltas[r][k] = length change of the first k ops of replica r
+    deltas = defaultdict(lambda: [0])
+    seen = {}
+    sequential = True
+    doc = Rope()
+    for i, (author, vc, edit) in enumerate(ops):
+        report.ops += 1
+        vc = {int(k): c for k, c in vc.items()}
+        length = sum(deltas[r][min(c, len(deltas[r]) - 1)]
+                     for r, c in vc.items() if r != author)
+        length += deltas[author][-1]
+        if any(vc.get(r, 0) < c for r, c in seen.items()):
+            sequential = False
+        idx = edit[0]
+        if edit[1] == 0:
+            ok = 0 <= idx <= length
+            delta = len(edit[2])
+        else:
+            ok = idx >= 0 and idx + edit[1] <= length
+            delta = -edit[1]
+        report.chars += abs(delta)
+        if not ok and not sequential:
+            # maybe only the length is too low, see above
+            report.warn(f'op {i} by {author}: {edit} (length at least {length})')
+        elif not ok:
+            report.bad(f'op {i} by {author}: {edit} (length {length})')
+            delta = 0
+        elif sequential:
+            doc.splice(edit)
+        deltas[author].append(deltas[author][-1] + delta)
+        seen[author] = vc.get(author, 0)
+    report.revisions = len(ops)
+    if sequential:
+        report.texts['final'] = str(doc)
+
+
+def check(fn):
+    if fn.endswith(ctrace.SUFFIX):
+        report = Report(fn, 'linear (compact)')
+        with open(fn, 'rb') as fp:
+            check_linear(ctrace.read(fp), report, compact=True)
+        return report
+    with open(fn) as fp:
+        first = fp.readline()
+        fp.seek(0)
+        if fn.endswith('.ndjson'):
+            head = json.loads(first)
+            if isinstance(head, dict):
+                report = Report(fn, 'revs2causal (NDJSON)')
+                next(fp)
+                check_revs2causal((json.loads(line) for line in fp if line.strip()),
+                                  head['numPeers'], report)
+            else:
+                report = Report(fn, 'linear (NDJSON)')
+                check_linear((json.loads(line) for line in fp if line.strip()), report)
+            return report
+        data = json.load(fp)
+    if isinstance(data, dict) and 'numPeers' in data:
+        report = Report(fn, 'revs2causal')
+        check_revs2causal(data['trace'], data['numPeers'], report)
+    elif is_causal(data):
+        report = Report(fn, 'causal')
+        check_causal(decoded_clocks(data), report)
+    else:
+        report = Report(fn, 'linear')
+        check_linear(data, report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--expect', metavar='SHA256',
+                        help='expected sha256 of the final text')
+    parser.add_argument('traces', nargs='+')
+    args = parser.parse_args()
+
+    ok = True
+    for fn in args.traces:
+        report = check(fn)
+        final = report.texts.get('final')
+        if args.expect and final is not None and sha(final) != args.expect:
+            report.mismatch(f'final text sha256 is not {args.expect}')
+        report.print()
+        ok = ok and report.ok()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# Compact (run-length) encoding of linear traces.
+#
+# A linear trace is a list of mini-traces (one per revision), each a list of
+# per-character splice ops: [idx, 0, ch] inserts ch at idx, [idx, 1] deletes
+# the char at idx (see crunch/data.js). Expanding every inserted/deleted
+# string of a diff into one op per character makes the JSON traces huge, so
+# instead we store runs:
+#
+#   (0, idx, text)   insert `text` at idx  ==> [idx, 0, ch0], [idx+1, 0, ch1] ...
+#   (1, idx, count)  delete count at idx   ==> [idx+count-1, 1], ... [idx, 1]
+#
+# and expand them lazily when the benchmark loads the trace, so the per-char
+# ops it sees are exactly the same. Deletes are expanded from the right, like
+# the JSON traces always did.
+#
+# File layout (little endian), read by crunch/ctrace.js:
+#
+#   MAGIC
+#   frame*  u32 payload length, payload
+#
+# where every frame is one revision, and the payload is a u32 number of runs
+# followed by the runs:
+#
+#   u8 0, u32 idx, u32 nbytes, utf-8 text
+#   u8 1, u32 idx, u32 count
+import struct
+
+
+MAGIC = b'CTRACE\x00\x01'
+SUFFIX = '.ct'
+U32 = struct.Struct('<I')
+INS = struct.Struct('<BII')
+DEL = struct.Struct('<BII')
+
+
+def diff_to_runs(diff):
+    runs = []
+    idx = 0
+    for [t, text] in diff:
+        if t == 1:
+            runs.append((0, idx, text))
+            idx += len(text)
+        elif t == -1:
+            runs.append((1, idx, len(text)))
+        else:
+            idx += len(text)
+    return runs
+
+
+def expand(runs):
+    for t, idx, x in runs:
+        if t == 0:
+            for ch in x:
+                yield [idx, 0, ch]
+                idx += 1
+        else:
+            for i in range(x - 1, -1, -1):
+                yield [idx + i, 1]
+
+
+def coalesce(ops):
+    # Merge per-char ops back into runs with the same effect, the inverse
+    # of expand() for traces written by revs2trace.
+    runs = []
+    t = idx = x = None
+    n = 0  # chars in the insert run
+    for op in ops:
+        if op[1] == 0:
+            if t == 0 and op[0] == idx + n:
+                x.append(op[2])
+                n += len(op[2])
+                continue
+            _flush(runs, t, idx, x)
+            t, idx, x = 0, op[0], [op[2]]
+            n = len(op[2])
+        else:
+            if t == 1 and op[1] == 1 and op[0] in (idx - 1, idx):
+                idx = op[0]
+                x += 1
+                continue
+            _flush(runs, t, idx, x)
+            t, idx, x = 1, op[0], op[1]
+    _flush(runs, t, idx, x)
+    return runs
+
+
+def _flush(runs, t, idx, x):
+    if t == 0:
+        runs.append((0, idx, ''.join(x)))
+    elif t == 1:
+        runs.append((1, idx, x))
+
+
+def apply(doc, runs):
+    # doc: rope.Rope
+    for t, idx, x in runs:
+        if t == 0:
+            doc.insert(idx, x)
+        else:
+            doc.delete(idx, x)
+
+
+def encode(runs):
+    parts = [U32.pack(len(runs))]
+    for t, idx, x in runs:
+        if t == 0:
+            b = x.encode('utf-8')
+            parts.append(INS.pack(0, idx, len(b)))
+            parts.append(b)
+        else:
+            parts.append(DEL.pack(1, idx, x))
+    return b''.join(parts)
+
+
+def decode(payload):
+    [n] = U32.unpack_from(payload, 0)
+    pos = U32.size
+    runs = []
+    for _ in range(n):
+        t, idx, x = INS.unpack_from(payload, pos)
+        pos += INS.size
+        if t == 0:
+            runs.append((0, idx, bytes(payload[pos:pos + x]).decode('utf-8')))
+            pos += x
+        else:
+            runs.append((1, idx, x))
+    return runs
+
+
+class Writer:
+    def __init__(self, fp):
+        self.fp = fp
+        fp.write(MAGIC)
+
+    def add(self, runs):
+        payload = encode(runs)
+        self.fp.write(U32.pack(len(payload)))
+        self.fp.write(payload)
+
+
+def read(fp):
+    # Yields the runs of every revision
+    if fp.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f'{fp.name}: not a compact trace')
+    while True:
+        head = fp.read(U32.size)
+        if not head:
+            return
+        [n] = U32.unpack(head)
+        yield decode(fp.read(n))
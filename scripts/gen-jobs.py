@@ -1,7 +1,44 @@
 #!/usr/bin/env python
+# gen-jobs.py [--local [-j CORES] [--node NODE]] [-a ALGS] [-d DATASETS]
+#             [--force] [--no-cache] [--dry-run]
+#             [--profile [--profile-dir DIR] | --adaptive]
+#             [--retry-infeasible] [matrix ...]
+#
+# By default writes a SLURM script per job and prints the `sbatch` lines
+# (with --dependency between jobs that need each other's outputs). With
+# --local the same jobs are run right away on this machine instead, see
+# scripts/runner.py. What runs is declared in scripts/matrix.py, jobs that
+# are already up to date are skipped (see scripts/planner.py), and jobs whose
+# code and inputs did not change get their results from the result cache
+# (see scripts/resultcache.py).
+#
+# With --profile every benchmark runs under V8's CPU and sampling heap
+# profilers instead. A profiled job is named `<job>-prof`, writes its
+# results and profiles to `prof/<job>/` (`--profile-dir` for another place
+# than prof/; one directory per node command, described in
+# `prof/<job>/job.json`) instead of res2/, and is never cached.
+# Aggregate the profiles with `python -m analysis.profiles prof/`.
+#
+# With --adaptive the repeats of the timing benchmarks (ADAPTIVE) are run by
+# scripts/adaptive.py, which stops once the median per-op time is known
+# precisely enough (all repeats in one node process); their `-n` becomes the
+# maximum.
+#
+# With --local, jobs that report their progress are killed as soon as they
+# are projected to run over their time limit, and their cells are left out
+# from then on (see scripts/predict.py); --retry-infeasible runs them anyway.
 
 # import os.path
-from itertools import product
+import argparse
+import json
+import os
+import re
+import sys
+
+import matrix
+import planner
+import resultcache
+import runner
 
 TEMPLATE = '''\
 #!/bin/bash
@@ -16,265 +53,222 @@ TEMPLATE = '''\
 '''
 
 
-PRINTED_HEADER = False
+NODE = '~/.nvm/versions/node/v15.0.1/bin/node'
+JOBS = []
+PROFILE_DIR = None
+PROFILED = {}  # profiled job name -> [(profile dir, node command), ...]
+RESULT = re.compile(r'> (res\d+)/')
+ADAPTIVE = None
+# benchmarks taking --adaptive (adaptiveRepeat() in bench/utils.js)
+ADAPTIVE_SCRIPTS = {
+    'bench/linear-time.js',
+    'bench/replay-causal-traces.js',
+    'bench/replay-git.js',
+    'bench/replay-yjs.js',
+    'bench/replay-automerge.js',
+}
+REPEATED = re.compile(r'(?P<script>\S+)(?P<args>.*?) -n (?P<n>\d+)(?P<rest>.*?) > (?P<out>\S+)')
 
 
-def job(fn, prog, cc=4, time='4:00:00'):
-    global PRINTED_HEADER
-    if not PRINTED_HEADER:
-        print('#!/bin/sh')
-        PRINTED_HEADER = True
+def job(fn, prog, cc=4, time='4:00:00', inputs=(), outputs=(), code=(), cell=None):
+    if PROFILE_DIR is not None:
+        fn, prog, outputs = profiled(fn, prog, outputs)
+        cell = None  # the profilers' overhead says nothing about feasibility
+    if ADAPTIVE:
+        prog = adaptive(prog, time)
     prog = ' && \\\n'.join(
-        '~/.nvm/versions/node/v15.0.1/bin/node --expose-gc ' + p
+        f'{NODE} --expose-gc ' + p
         if isinstance(p, str) else p[1]
         for p in prog)
-    open(fn, 'w').write(TEMPLATE.format(prog=prog, cc=cc, time=time))
-    print(f'sbatch {fn}')
+    JOBS.append(runner.Job(fn, prog, cc, time, tuple(inputs), tuple(outputs),
+                           code=tuple(code), cell=cell))
 
 
-# Linear Traces
-def microLTR_RTL():
-    datasets = ['microLTR', 'microRTL']
-    algorithms = [
-        # 'Automerge',
-        # 'Automerge+WASM',
-        'Logoot',
-        # 'Woot',
-        # 'RGA',
-        # 'Treedoc',
-        # 'LSEQ',
-        # 'DLS',
-        # 'Yjs',
-    ]
-    for data in datasets:
-        for alg in algorithms:
-            prog = []
-            time = '10:00:00'
-            mem_repeats = 5
-            # if alg == 'Logoot':
-            #     repeats = 3
-            #     mem_repeats = 3
-            prog.append(f'bench/linear.js -l 10 -c {alg} -d {data} -n 11 -m {mem_repeats} > res2/{alg}-{data}-10')
-            prog.append(f'bench/automerge-perf-sizes.js .tmp/{alg}-linear-{data}-10k-doc {alg} 11 > res2/{alg}-{data}-10k-encdec')
-            job(f'jobs/linear-{alg}-{data}', prog, time=time)
-            # job(f'jobs/linear-{alg}-{data}', prog, time='02:00:00')
+def profiled(fn, prog, outputs):
+    # The same job under the profilers, writing to PROFILE_DIR/<job>/
+    base = f'{PROFILE_DIR}/{os.path.basename(fn)}'
+    steps = [(0, f"mkdir -p '{base}'")]
+    PROFILED[fn + '-prof'] = []
+    for i, p in enumerate(prog):
+        if not isinstance(p, str):
+            steps.append(p)
+            continue
+        d = f'{base}/{i}'
+        PROFILED[fn + '-prof'].append((d, p))
+        steps.append(f'--cpu-prof --cpu-prof-dir={d} --heap-prof --heap-prof-dir={d} '
+                     + RESULT.sub(f'> {base}/', p))
+    outputs = [f'{base}/{os.path.basename(out)}' if RESULT.match('> ' + out) else out
+               for out in outputs]
+    return fn + '-prof', steps, outputs
+
+
+def adaptive(prog, time):
+    # Runs the repeats of the ADAPTIVE_SCRIPTS steps with scripts/adaptive.py,
+    # sharing 80% of the time limit between the node commands.
+    steps = sum(isinstance(p, str) for p in prog)
+    budget = int(runner.parse_time(time) * 0.8 / max(steps, 1))
+    out = []
+    for p in prog:
+        m = REPEATED.fullmatch(p) if isinstance(p, str) else None
+        if m is None or m['script'] not in ADAPTIVE_SCRIPTS or '--run_gc' in p:
+            out.append(p)
+            continue
+        out.append((0, f"python3 scripts/adaptive.py --max {m['n']} --budget {budget}"
+                       f" -o {m['out']} --"
+                       f" {NODE} --expose-gc {m['script']}{m['args']}{m['rest']}"))
+    return out
+
+
+def write_profile_specs(jobs):
+    for j in jobs:
+        base = f'{PROFILE_DIR}/{os.path.basename(j.name)[:-len("-prof")]}'
+        os.makedirs(base, exist_ok=True)
+        with open(f'{base}/job.json', 'w') as fp:
+            json.dump({'job': j.name,
+                       'steps': [{'dir': d, 'cmd': cmd} for d, cmd in PROFILED[j.name]]},
+                      fp, indent=1)
+
+
+def done(j):
+    planner.record(j.name, planner.job_key(j))
+    resultcache.store(j)
+
+
+def write_slurm(jobs, cache=True):
+    print('#!/bin/sh')
+    var = {}
+    for i, j in enumerate(jobs, 1):
+        prog = j.cmd + f" && \\\npython3 scripts/planner.py done '{j.name}' {planner.job_key(j)}"
+        if cache:
+            resultcache.write_spec(j, j.name + '.spec')
+            prog += f" && \\\npython3 scripts/resultcache.py store '{j.name}'"
+        open(j.name, 'w').write(TEMPLATE.format(prog=prog, cc=j.cc, time=j.time))
+        var[j.name] = f'j{i}'
+        dep = ''
+        if j.deps:
+            dep = ' --dependency=afterok:' + ':'.join(f'${var[d]}' for d in j.deps)
+        print(f'j{i}=$(sbatch --parsable{dep} {j.name})')
 
 
 # Linear Traces
-def linear_traces():
-    datasets = [
-        # 'microLTR',
-        # 'microRTL',
-        # 'automerge',
-        '2017_in_home_video',
-        '2021_Kerala_Legislative_Assembly_election',
-        # 'George_W._Bush',
-        # 'Jesus',
-        # 'List_of_dramatic_television_series_with_LGBT_characters',
-        # 'List_of_Nintendo_Switch_games_A-F',
-        # 'List_of_WWE_personnel',
-        # 'Spring_Championship_of_Online_Poker',
-        # 'United_States',
-        # 'Wikipedia',
-    ]
-    algorithms = [
-        # # 'Automerge',
-        # 'Automerge+WASM',
-        'Logoot',
-        # 'Woot',
-        # 'RGA',
-        # 'Treedoc',
-        # 'LSEQ',
-        # 'DLS',
-        # 'Yjs',
-    ]
+def microLTR_RTL(algs, datasets):
+    for data, alg, _, _ in matrix.cells('microLTR_RTL', algs, datasets):
+        prog = []
+        time = '10:00:00'
+        mem_repeats = 5
+        # if alg == 'Logoot':
+        #     repeats = 3
+        #     mem_repeats = 3
+        prog.append(f'bench/linear.js -l 10 -c {alg} -d {data} -n 11 -m {mem_repeats} > res2/{alg}-{data}-10')
+        prog.append(f'bench/automerge-perf-sizes.js .tmp/{alg}-linear-{data}-10k-doc {alg} 11 > res2/{alg}-{data}-10k-encdec')
+        job(f'jobs/linear-{alg}-{data}', prog, time=time,
+            outputs=[f'res2/{alg}-{data}-10',
+                     f'.tmp/{alg}-linear-{data}-10k-doc',
+                     f'res2/{alg}-{data}-10k-encdec'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('microLTR_RTL', alg, data))
+        # job(f'jobs/linear-{alg}-{data}', prog, time='02:00:00')
 
-    # mapping = {
-    #     'W1': 'George_W._Bush',
-    #     'W2': 'Wikipedia',
-    #     'W3': 'List_of_WWE_personnel',
-    #     'W4': 'United_States',
-    #     'W5': 'Jesus',
-    #     'W6':  'List_of_dramatic_television_series_with_LGBT_characters',
-    #     'W7':  'Spring_Championship_of_Online_Poker',
-    #     'W8':  '2017_in_home_video',
-    #     'W9':  'List_of_Nintendo_Switch_games_A-F',
-    #     'W10': '2021_Kerala_Legislative_Assembly_election',
-    # }
-    # finished = {
-    #     'Woot':           ['W6'],
-    #     'Automerge':      ['W6', 'W3'],
-    #     'Automerge+WASM': ['W8', 'W10', 'W1', 'W5', 'W6', 'W3', 'W4', 'W2'],
-    #     'Logoot':         ['W8', 'W1', 'W5', 'W6', 'W3', 'W4', 'W2'],
-    #     'Treedoc':        ['W1', 'W5', 'W6', 'W3', 'W4', 'W2'],
-    #     'RGA':            ['W8', 'W10', 'W1', 'W5', 'W6', 'W9', 'W3', 'W7', 'W4', 'W2'],
-    #     'LSEQ':           ['W8', 'W10', 'W1', 'W5', 'W6', 'W9', 'W3', 'W7', 'W4', 'W2'],
-    #     'DLS':            ['W8', 'W10', 'W1', 'W5', 'W6', 'W9', 'W3', 'W7', 'W4', 'W2'],
-    #     'Yjs':            ['W8', 'W10', 'W1', 'W5', 'W6', 'W9', 'W3', 'W7', 'W4', 'W2'],
-    # }
-
-    for data in datasets:
-        for alg in algorithms:
-            prog = []
-            prog.append(f'bench/linear-time.js -c {alg} -d {data} -n 11 > res2/{alg}-{data}')
-            prog.append(f'bench/automerge-perf-sizes.js .tmp/{alg}-linear-time-{data}-doc {alg} 11 > res2/{alg}-{data}-encdec')
-            job(f'jobs/linear-{alg}-{data}', prog, time='10:00:00')
 
-    # for alg, done in finished.items():
-    #     if alg != 'Woot':
-    #         continue
-    #     for ref in done:
-    #         data = mapping[ref]
-    #         prog = []
-    #         prog.append(f'bench/automerge-perf-sizes.js .tmp/{alg}-linear-time-{data}-doc {alg} 11 > res2/{alg}-{data}-encdec')
-    #         job(f'jobs/linear-{alg}-{ref}', prog, time='02:00:00')
+# Linear Traces
+def linear_traces(algs, datasets):
+    for data, alg, repeats, _ in matrix.cells('linear_traces', algs, datasets):
+        prog = []
+        prog.append(f'bench/linear-time.js -c {alg} -d {data} -n {repeats} > res2/{alg}-{data}')
+        prog.append(f'bench/automerge-perf-sizes.js .tmp/{alg}-linear-time-{data}-doc {alg} {repeats} > res2/{alg}-{data}-encdec')
+        job(f'jobs/linear-{alg}-{data}', prog, time='10:00:00',
+            inputs=[f'.wiki-traces/{data}', f'.wiki-traces/{data}.ct',
+                    f'.wiki-traces/{data}.ndjson'],
+            outputs=[f'res2/{alg}-{data}',
+                     f'.tmp/{alg}-linear-time-{data}-doc',
+                     f'res2/{alg}-{data}-encdec'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('linear_traces', alg, data))
 
 
 # Causal Traces -- generate
-def causal_traces_generate():
-    datasets = [
-        ['g1.json',   [1, 2, 3, 4, 5, 6, 9, 11, 12]],
-        ['g2.json',   [1, 2, 3, 4, 6, 7, 9, 10, 12, 13, 17, 19, 20, 22, 23, 25]],
-        ['g3.json',   [1, 3, 5, 6, 8, 10]],
-        ['doc1.json', [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 15, 16, 17, 18, 19, 20, 21, 22]],
-        ['doc2.json', [1, 2, 3, 4, 6, 10, 11, 12, 17, 19, 21, 23, 24]],
-    ]
-    algorithms = [
-        # ['Automerge',      5],
-        # ['Automerge+WASM', 5],
-        # ['Logoot',         5],
-        # ['Woot',           5],
-        ['RGA',            10],
-        # ['Treedoc',        10],
-        # ['LSEQ',           10],
-        # ['DLS',            10],
-        # ['Yjs',            10],
-    ]
-    cannot = {
-        # 'LSEQ': {'doc1.json', 'doc2.json', 'g1.json', 'g3.json'},
-        # 'Woot': {'doc1.json', 'g2.json'},
-        # 'Woot': {'g3.json', 'g1.json', 'doc2.json'},
-    }
+def causal_traces_generate(algs, datasets):
     RDS_DIR = '/rds/user/je437/hpc-work/ct'
-    for data, _ in datasets:
-        for alg, _ in algorithms:
-            if data in cannot.get(alg, []):
-                continue
-            time = '10:00:00'
-            if alg.startswith('Automerge'):
-                time = '8:00:00'
+    for data, alg, _, _ in matrix.cells('causal_traces_generate', algs, datasets):
+        time = '10:00:00'
+        if alg.startswith('Automerge'):
+            time = '8:00:00'
 
-            prog = []
-            prog.append((0, f"export CRUNCH_WD='{RDS_DIR}/{alg}-{data}'"))
-            prog.append((0, f"mkdir -p '{RDS_DIR}/{alg}-{data}'"))
-            prog.append(f"bench/causal-traces.js -c '{alg}' -d '.causal-traces/{data}'")
-            job(f"jobs/ct-{alg}-{data}-gen", prog, time=time)
+        prog = []
+        prog.append((0, f"export CRUNCH_WD='{RDS_DIR}/{alg}-{data}'"))
+        prog.append((0, f"mkdir -p '{RDS_DIR}/{alg}-{data}'"))
+        prog.append(f"bench/causal-traces.js -c '{alg}' -d '.causal-traces/{data}'")
+        job(f"jobs/ct-{alg}-{data}-gen", prog, time=time,
+            inputs=[f'.causal-traces/{data}'],
+            outputs=[f'{RDS_DIR}/{alg}-{data}',
+                     f'.tmp/{alg}-{data}-causal-doc',
+                     f'res2/{alg}-{data}-causal-sizes'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('causal_traces_generate', alg, data))
 
 
 # Causal Traces -- execute
-def causal_traces_execute():
-    datasets = [
-        ['g1.json',   [1, 2, 3, 4, 5, 6, 9, 11, 12]],
-        ['g2.json',   [1, 2, 3, 4, 6, 7, 9, 10, 12, 13, 17, 19, 20, 22, 23, 25]],
-        ['g3.json',   [1, 3, 5, 6, 8, 10]],
-        ['doc1.json', [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 15, 16, 17, 18, 19, 20, 21, 22]],
-        ['doc2.json', [1, 2, 3, 4, 6, 10, 11, 12, 17, 19, 21, 23, 24]],
-    ]
-    algorithms = [
-        # ['Automerge',      11],
-        # ['Automerge+WASM', 11],
-        ['Logoot',         11],
-        # ['Woot',           11],
-        # ['RGA',            11],
-        # ['Treedoc',        11],
-        # ['LSEQ',           11],
-        # ['DLS',            11],
-        # ['Yjs',            11],
-    ]
-    cannot = {
-        'LSEQ': {'doc1.json', 'doc2.json', 'g1.json', 'g3.json'},
-        'Woot': {'g2.json', 'g3.json', 'doc1.json'},
-    }
+def causal_traces_execute(algs, datasets):
     RDS_DIR = '/rds/user/je437/hpc-work/ct'
-    for data, ids in datasets:
-        for alg, repeats in algorithms:
-            if data in cannot.get(alg, []):
-                continue
-            job(f"jobs/ct-{alg}-{data}-run", [f'bench/automerge-perf-sizes.js ".tmp/{alg}-{data}-causal-doc" {alg} > res2/{alg}-{data}-encdec'], time='01:00:00')
-            for id in ids:
-                prog = []
-                prog.append(f"bench/replay-causal-traces.js"
-                            f" -c '{alg}'"
-                            f" -f '{RDS_DIR}/{alg}-{data}/{alg}-{data}-{id}'"
-                            f" -i {id}"
-                            f" -n {repeats} > res2/{alg}-{data}-{id}")
-                prog.append(f"bench/replay-causal-traces.js"
-                            f" -c '{alg}'"
-                            f" -f '{RDS_DIR}/{alg}-{data}/{alg}-{data}-{id}'"
-                            f" -i {id}"
-                            f" -n 5 --run_gc > res2/{alg}-{data}-{id}-mem")
-                job(f"jobs/ct-{alg}-{data}-{id}-run", prog, time='05:00:00')
+    for data, alg, repeats, ids in matrix.cells('causal_traces_execute', algs, datasets):
+        job(f"jobs/ct-{alg}-{data}-run", [f'bench/automerge-perf-sizes.js ".tmp/{alg}-{data}-causal-doc" {alg} > res2/{alg}-{data}-encdec'], time='01:00:00',
+            inputs=[f'.tmp/{alg}-{data}-causal-doc'],
+            outputs=[f'res2/{alg}-{data}-encdec'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('causal_traces_execute', alg, data))
+        for id in ids:
+            log = f'{RDS_DIR}/{alg}-{data}/{alg}-{data}-{id}'
+            prog = []
+            prog.append(f"bench/replay-causal-traces.js"
+                        f" -c '{alg}'"
+                        f" -f '{log}'"
+                        f" -i {id}"
+                        f" -n {repeats} > res2/{alg}-{data}-{id}")
+            prog.append(f"bench/replay-causal-traces.js"
+                        f" -c '{alg}'"
+                        f" -f '{log}'"
+                        f" -i {id}"
+                        f" -n 5 --run_gc > res2/{alg}-{data}-{id}-mem")
+            job(f"jobs/ct-{alg}-{data}-{id}-run", prog, time='05:00:00',
+                inputs=[log],
+                outputs=[f'res2/{alg}-{data}-{id}', f'res2/{alg}-{data}-{id}-mem'],
+                code=matrix.IMPLEMENTATIONS[alg], cell=('causal_traces_execute', alg, data))
 
 
 # Git Traces -- generate
-def git_traces_generate():
-    datasets = [
-        'Documentation-diff-options-txt.ord',
-        'Documentation-git-branch-txt.ord',
-        'Documentation-git-checkout-txt.ord',
-        'Documentation-git-clone-txt.ord',
-        'Documentation-git-commit-txt.ord',
-        'Documentation-git-format-patch-txt.ord',
-        'Documentation-git-p4-txt.ord',
-        'Documentation-git-push-txt.ord',
-        'Documentation-git-read-tree-txt.ord',
-        'Documentation-git-rev-parse-txt.ord',
-        'Documentation-git-send-email-txt.ord',
-        'Documentation-git-submodule-txt.ord',
-    ]
-    algorithms = [
-        # ['Automerge', 5],
-        ['Logoot',    5],
-        # ['Woot',      5],
-        # ['RGA',       10],
-        # ['Treedoc',   10],
-        # ['LSEQ',      10],
-        # ['DLS',       10],
-        # ['Yjs',       10],
-    ]
+def git_traces_generate(algs, datasets):
     RDS_BASE = '/rds/user/je437/hpc-work'
     RDS_DIR = '/rds/user/je437/hpc-work/git'
     blobs_dir = f'{RDS_BASE}/git-blobs'
-    for data in datasets:
-        for alg, _ in algorithms:
-            if (alg == 'Automerge' and data == 'Documentation-diff-options-txt.ord'):
-                continue
-            gen = (
-                'bench/git-yjs.js' if alg == 'Yjs' else
-                'bench/git-automerge.js -c Automerge' if alg == 'Automerge' else
-                f'bench/git.js -c {alg}'
-            )
-            time = '10:00:00'
-            prog = []
-            prog.append((0, f"export CRUNCH_WD='{RDS_DIR}/{alg}-{data}/logs'"))
-            prog.append((0, "export CRUNCH_IS_GIT=1"))
-            # prog.append((0, f"rm -rf '{RDS_DIR}/{alg}-{data}'"))
-            prog.append((0, f"mkdir -p '{RDS_DIR}/{alg}-{data}/logs'"))
-            prog.append((0, f"mkdir -p '{RDS_DIR}/{alg}-{data}/docs'"))
-            prog.append((0, f"mkdir -p '{RDS_DIR}/{alg}-{data}/merges'"))
-            prog.append(f"{gen} -f '{data}' -b '{blobs_dir}' -w '{RDS_DIR}/{alg}-{data}/docs'")
-            log_path = (
-                f"{RDS_DIR}/{alg}-{data}/docs/{alg}-{data}-1"
-                if (alg == 'Automerge' or alg == 'Yjs') else
-                f"{RDS_DIR}/{alg}-{data}/docs/{alg}-{data}-git-oplog"
-            )
-            prog.append(f"bench/git-merge.js"
-                        f" -s '{RDS_DIR}/{alg}-{data}/docs/{alg}-{data}-git-snapshots'"
-                        f" -o '{blobs_dir}/{data}'"
-                        f" -c '{alg}'"
-                        f" -f '{log_path}'"
-                        f" -O '{RDS_DIR}/{alg}-{data}/merges/' > {RDS_DIR}/{alg}-{data}/merges.json")
-            job(f"jobs/git-{alg}-{data}-gen", prog, time=time)
+    for data, alg, _, _ in matrix.cells('git_traces_generate', algs, datasets):
+        gen = (
+            'bench/git-yjs.js' if alg == 'Yjs' else
+            'bench/git-automerge.js -c Automerge' if alg == 'Automerge' else
+            f'bench/git.js -c {alg}'
+        )
+        time = '10:00:00'
+        prog = []
+        prog.append((0, f"export CRUNCH_WD='{RDS_DIR}/{alg}-{data}/logs'"))
+        prog.append((0, "export CRUNCH_IS_GIT=1"))
+        # prog.append((0, f"rm -rf '{RDS_DIR}/{alg}-{data}'"))
+        prog.append((0, f"mkdir -p '{RDS_DIR}/{alg}-{data}/logs'"))
+        prog.append((0, f"mkdir -p '{RDS_DIR}/{alg}-{data}/docs'"))
+        prog.append((0, f"mkdir -p '{RDS_DIR}/{alg}-{data}/merges'"))
+        prog.append(f"{gen} -f '{data}' -b '{blobs_dir}' -w '{RDS_DIR}/{alg}-{data}/docs'")
+        log_path = (
+            f"{RDS_DIR}/{alg}-{data}/docs/{alg}-{data}-1"
+            if (alg == 'Automerge' or alg == 'Yjs') else
+            f"{RDS_DIR}/{alg}-{data}/docs/{alg}-{data}-git-oplog"
+        )
+        prog.append(f"bench/git-merge.js"
+                    f" -s '{RDS_DIR}/{alg}-{data}/docs/{alg}-{data}-git-snapshots'"
+                    f" -o '{blobs_dir}/{data}'"
+                    f" -c '{alg}'"
+                    f" -f '{log_path}'"
+                    f" -O '{RDS_DIR}/{alg}-{data}/merges/' > {RDS_DIR}/{alg}-{data}/merges.json")
+        job(f"jobs/git-{alg}-{data}-gen", prog, time=time,
+            inputs=[f'{blobs_dir}/{data}'],
+            outputs=[f'{RDS_DIR}/{alg}-{data}/logs',
+                     f'{RDS_DIR}/{alg}-{data}/docs',
+                     f'{RDS_DIR}/{alg}-{data}/merges',
+                     f'{RDS_DIR}/{alg}-{data}/merges.json'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('git_traces_generate', alg, data))
 
 
 GIT_INTERESTED = dict([
@@ -294,99 +288,68 @@ GIT_INTERESTED = dict([
 
 
 # Git Traces -- execute
-def git_traces_execute():
-    datasets = [
-        'Documentation-diff-options-txt.ord',
-        'Documentation-git-branch-txt.ord',
-        'Documentation-git-checkout-txt.ord',
-        'Documentation-git-clone-txt.ord',
-        'Documentation-git-commit-txt.ord',
-        'Documentation-git-format-patch-txt.ord',
-        'Documentation-git-p4-txt.ord',
-        'Documentation-git-push-txt.ord',
-        'Documentation-git-read-tree-txt.ord',
-        'Documentation-git-rev-parse-txt.ord',
-        'Documentation-git-send-email-txt.ord',
-        'Documentation-git-submodule-txt.ord',
-    ]
-    algorithms = [
-        # ['Automerge', 6],
-        ['Logoot',    6],
-        # ['Woot',      11],
-        # ['RGA',       11],
-        # ['Treedoc',   11],
-        # ['LSEQ',      11],
-        # ['DLS',       11],
-        # ['Yjs',       11],
-    ]
-    cannot = {
-        'Automerge': ['Documentation-diff-options-txt.ord'],
-        'Woot':      ['Documentation-git-rev-parse-txt.ord', 'Documentation-git-send-email-txt.ord'],
-    }
+def git_traces_execute(algs, datasets):
     RDS_DIR = '/rds/user/je437/hpc-work/git'
-    for data in datasets:
-        for alg, repeats in algorithms:
-            if alg in cannot and data in cannot[alg]:
-                continue
-            workdir = f'{RDS_DIR}/{alg}-{data}'
-            prog = []
-            prog.append((0, f"export CRUNCH_WD='{RDS_DIR}/{alg}-{data}/logs'"))
-            prog.append((0, "export CRUNCH_IS_GIT=1"))
-            prog2 = prog + [
-                f'bench/git-merge-run.js'
-                f' -c {alg}'
-                f' -i {workdir}/merges.json'
-                f' -p {workdir}/docs/{alg}-{data}'
-                f' -O {workdir}/merges'
-                f' -n {repeats} > res2/{alg}-{data}-merges'
-            ]
-            logfile = '1' if alg in ('Automerge', 'Yjs') else 'git-oplog'
-            prog3 = prog + [
-                f'bench/git-restore.js'
-                f' -c {alg}'
-                f' -s {workdir}/docs/{alg}-{data}-git-snapshots'
-                f' -f {workdir}/docs/{alg}-{data}-{logfile}'
-                f' -n {repeats}'
-                f' -o /rds/user/je437/hpc-work/git-blobs/{data} > res2/{alg}-{data}-restore'
-            ]
-            replay_prog = (
-                'bench/replay-yjs.js' if alg == 'Yjs' else
-                'bench/replay-automerge.js' if alg == 'Automerge' else
-                f'bench/replay-git.js -c {alg}'
-            )
-            prog4 = prog + [
-                f'{replay_prog}'
-                f' -f {workdir}/logs/{alg}-{data}-{id}'
-                f' -i {id}'
-                f' -n {repeats} > res2/{alg}-{data}-replay-{id}'
-                for id in GIT_INTERESTED[data]
-            ]
-            prog5 = prog + [
-                f'bench/git-doc-state-mem.js'
-                f' {workdir}/docs/'
-                f' {alg}'
-                f' {repeats} > res4/{alg}-{data}-encdec'
-            ]
-            job(f"jobs/git-{alg}-{data}-merge",   prog2, time='06:00:00')
-            job(f"jobs/git-{alg}-{data}-restore", prog3, time='10:00:00')
-            job(f"jobs/git-{alg}-{data}-replay",  prog4, time='10:00:00')
-            job(f"jobs/git-{alg}-{data}-encdec",  prog5, time='01:00:00')
-
-
-def user_ops():
+    for data, alg, repeats, _ in matrix.cells('git_traces_execute', algs, datasets):
+        workdir = f'{RDS_DIR}/{alg}-{data}'
+        prog = []
+        prog.append((0, f"export CRUNCH_WD='{RDS_DIR}/{alg}-{data}/logs'"))
+        prog.append((0, "export CRUNCH_IS_GIT=1"))
+        prog2 = prog + [
+            f'bench/git-merge-run.js'
+            f' -c {alg}'
+            f' -i {workdir}/merges.json'
+            f' -p {workdir}/docs/{alg}-{data}'
+            f' -O {workdir}/merges'
+            f' -n {repeats} > res2/{alg}-{data}-merges'
+        ]
+        logfile = '1' if alg in ('Automerge', 'Yjs') else 'git-oplog'
+        prog3 = prog + [
+            f'bench/git-restore.js'
+            f' -c {alg}'
+            f' -s {workdir}/docs/{alg}-{data}-git-snapshots'
+            f' -f {workdir}/docs/{alg}-{data}-{logfile}'
+            f' -n {repeats}'
+            f' -o /rds/user/je437/hpc-work/git-blobs/{data} > res2/{alg}-{data}-restore'
+        ]
+        replay_prog = (
+            'bench/replay-yjs.js' if alg == 'Yjs' else
+            'bench/replay-automerge.js' if alg == 'Automerge' else
+            f'bench/replay-git.js -c {alg}'
+        )
+        prog4 = prog + [
+            f'{replay_prog}'
+            f' -f {workdir}/logs/{alg}-{data}-{id}'
+            f' -i {id}'
+            f' -n {repeats} > res2/{alg}-{data}-replay-{id}'
+            for id in GIT_INTERESTED[data]
+        ]
+        prog5 = prog + [
+            f'bench/git-doc-state-mem.js'
+            f' {workdir}/docs/'
+            f' {alg}'
+            f' {repeats} > res4/{alg}-{data}-encdec'
+        ]
+        job(f"jobs/git-{alg}-{data}-merge",   prog2, time='06:00:00',
+            inputs=[f'{workdir}/merges.json', f'{workdir}/docs', f'{workdir}/merges'],
+            outputs=[f'res2/{alg}-{data}-merges'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('git_traces_execute', alg, data))
+        job(f"jobs/git-{alg}-{data}-restore", prog3, time='10:00:00',
+            inputs=[f'{workdir}/docs'],
+            outputs=[f'res2/{alg}-{data}-restore'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('git_traces_execute', alg, data))
+        job(f"jobs/git-{alg}-{data}-replay",  prog4, time='10:00:00',
+            inputs=[f'{workdir}/logs'],
+            outputs=[f'res2/{alg}-{data}-replay-{id}' for id in GIT_INTERESTED[data]],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('git_traces_execute', alg, data))
+        job(f"jobs/git-{alg}-{data}-encdec",  prog5, time='01:00:00',
+            inputs=[f'{workdir}/docs'],
+            outputs=[f'res4/{alg}-{data}-encdec'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('git_traces_execute', alg, data))
+
+
+def user_ops(algs, datasets):
     # Linear user ops matrix...
-    docs = [
-        # ['g1',   '.tmp/{alg}-g1.json-causal-doc'],
-        ['g2',   '.tmp/{alg}-g2.json-causal-doc'],
-        # ['g3',   '.tmp/{alg}-g3.json-causal-doc'],
-        # ['doc1', '.tmp/{alg}-doc1.json-causal-doc'],
-        # ['doc2', '.tmp/{alg}-doc2.json-causal-doc'],
-    ]
-    cannot = {
-        'LSEQ': {'doc1', 'doc2', 'g1', 'g3'},
-    }
-    # algs = ['Automerge+WASM', 'Automerge', 'Logoot', 'Woot', 'RGA', 'Treedoc', 'LSEQ', 'DLS', 'Yjs']
-    algs = ['Logoot']
     constants = {'p_ins': 0.80, 'M': 5}
     linear_bench_types = [
         [True,  'random_grep',  ['M']],
@@ -400,9 +363,7 @@ def user_ops():
         # [False, 'n_move',       []],
     ]
     RDS_DIR = '/rds/user/je437/hpc-work/uo'
-    for alg, [doc_desc, doc_template] in product(algs, docs):
-        if alg in cannot and doc_desc in cannot[alg]:
-            continue
+    for doc_desc, alg, _, doc_template in matrix.cells('user_ops', algs, datasets):
         doc_path = doc_template.format(alg=alg)
         specs = []
         for is_block, bench_type, vars in linear_bench_types:
@@ -423,7 +384,10 @@ def user_ops():
             f" -p '{doc_path}'"
             f" {' '.join(specs)} > res2/{alg}-uo-{doc_desc}"
         ]
-        job(f'jobs/uo-loc-{alg}-{doc_desc}', prog=prog, time="08:00:00")
+        job(f'jobs/uo-loc-{alg}-{doc_desc}', prog=prog, time="08:00:00",
+            inputs=[doc_path],
+            outputs=[f'res2/{alg}-uo-{doc_desc}'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('user_ops', alg, doc_desc))
         prog = [
             (0, f"mkdir -p '{RDS_DIR}/{alg}-uo-r1-{doc_desc}'"),
             (0, f"export CRUNCH_WD='{RDS_DIR}/{alg}-uo-r1-{doc_desc}'"),
@@ -439,16 +403,120 @@ def user_ops():
             f" -p '{doc_path}'"
             f" -f '{RDS_DIR}/{alg}-uo-r1-{doc_desc}/traces' > res2/{alg}-uo-r1-{doc_desc}"
         ]
-        job(f'jobs/uo-r1-{alg}-{doc_desc}', prog=prog, time="08:00:00")
+        job(f'jobs/uo-r1-{alg}-{doc_desc}', prog=prog, time="08:00:00",
+            inputs=[doc_path],
+            outputs=[f'{RDS_DIR}/{alg}-uo-r1-{doc_desc}',
+                     f'res2/{alg}-uo-r1-{doc_desc}'],
+            code=matrix.IMPLEMENTATIONS[alg], cell=('user_ops', alg, doc_desc))
+
+
+MATRICES = {
+    'microLTR_RTL':           microLTR_RTL,
+    'linear_traces':          linear_traces,
+    'causal_traces_generate': causal_traces_generate,
+    'causal_traces_execute':  causal_traces_execute,
+    'git_traces_generate':    git_traces_generate,
+    'git_traces_execute':     git_traces_execute,
+    'user_ops':               user_ops,
+}
+
+
+def fetch_ready(jobs):
+    # Takes the jobs that don't wait for others out of a SLURM submission
+    # when their results are in the cache (the others are only known once
+    # their inputs are written).
+    hits = set()
+    rest = []
+    for j in jobs:
+        deps = tuple(d for d in j.deps if d not in hits)
+        if not deps and resultcache.fetch(j):
+            done(j)
+            hits.add(j.name)
+            print(f'[cache] {j.name}', file=sys.stderr)
+            continue
+        rest.append(j._replace(deps=deps))
+    return rest
+
+
+def selection(arg):
+    if arg is None or arg == matrix.ALL:
+        return arg
+    return arg.split(',')
+
+
+def main():
+    global NODE, PROFILE_DIR, ADAPTIVE
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--local', action='store_true',
+                        help='run the jobs on this machine instead of writing SLURM scripts')
+    parser.add_argument('-j', '--cores', type=int,
+                        help='number of cores to use with --local (default: all)')
+    parser.add_argument('--node', default='node',
+                        help='node binary to use with --local')
+    parser.add_argument('-a', '--algorithms', type=selection,
+                        help="comma separated, or 'all' (default: the matrix's selection)")
+    parser.add_argument('-d', '--datasets', type=selection,
+                        help="comma separated, or 'all' (default: the matrix's selection)")
+    parser.add_argument('--force', action='store_true',
+                        help='run jobs even if they are up to date')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='do not use the result cache')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only print which jobs would run')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--profile', action='store_true',
+                      help='run under the CPU and heap profilers')
+    mode.add_argument('--adaptive', action='store_true',
+                      help='stop repeating once the per-op times are precise enough')
+    parser.add_argument('--profile-dir', default='prof', metavar='DIR',
+                        help='where --profile writes results and profiles (default: prof)')
+    parser.add_argument('--retry-infeasible', action='store_true',
+                        help=f'also run the cells recorded in {matrix.INFEASIBLE}')
+    parser.add_argument('matrices', nargs='*', default=['git_traces_execute'],
+                        help=f'any of: {", ".join(MATRICES)}')
+    args = parser.parse_args()
+    for name in args.matrices:
+        if name not in MATRICES:
+            parser.error(f'unknown matrix: {name}')
+
+    if args.local:
+        NODE = args.node
+    if args.profile:
+        PROFILE_DIR = args.profile_dir
+        args.no_cache = True
+    ADAPTIVE = args.adaptive
+    if args.retry_infeasible:
+        matrix.INFEASIBLE = None
+    try:
+        for name in args.matrices:
+            MATRICES[name](args.algorithms, args.datasets)
+        jobs, skipped = planner.plan(JOBS, force=args.force)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f'{len(jobs)} jobs to run, {len(skipped)} up to date', file=sys.stderr)
+
+    if args.dry_run:
+        for j in jobs:
+            deps = f" (after {', '.join(j.deps)})" if j.deps else ''
+            print(f'{j.name}{deps}')
+        return
+    if PROFILE_DIR is not None:
+        write_profile_specs(jobs)
+    if not args.local:
+        if not args.no_cache:
+            jobs = fetch_ready(jobs)
+        write_slurm(jobs, cache=not args.no_cache)
+        return
+
+    cores = runner.available_cores()
+    if args.cores:
+        cores = cores[:args.cores]
+    failed = runner.run(jobs, cores, on_done=done,
+                        cached=None if args.no_cache else resultcache.fetch)
+    for j, status in failed:
+        print(f'FAILED {j.name}: {status}', file=sys.stderr)
+    sys.exit(1 if failed else 0)
 
 
 if __name__ == '__main__':
-    # microLTR_RTL()
-    # linear_traces()
-    # micro_conc()
-    # causal_traces_generate()
-    # causal_traces_execute()
-    # git_traces_generate()
-    git_traces_execute()
-    # user_ops()
-    pass
+    main()
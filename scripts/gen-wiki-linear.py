@@ -21,11 +21,10 @@ titles = [
 ]
 
 jobs = ['#!/bin/sh']
-for title, num_revs in titles:
-    jobs.append(f"python ./scripts/wiki.py \"{title}\"")
-for title, num_revs in titles:
-    jobs.append(f"./scripts/revs2trace"
-                f" '.wiki-revs/{slugify.slugify_filename(title)}_ids'"
-                f" '500'"
-                f" '.wiki-traces/{slugify.slugify_filename(title)}'")
+jobs.append("python ./scripts/wiki.py -j 4 " + ' '.join(f'"{title}"' for title, _ in titles))
+jobs.append("./scripts/revs2trace" + ''.join(
+    f" \\\n    '.wiki-revs/{slugify.slugify_filename(title)}_ids'"
+    f" '500'"
+    f" '.wiki-traces/{slugify.slugify_filename(title)}'"
+    for title, num_revs in titles))
 print('\n'.join(jobs))
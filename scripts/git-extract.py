@@ -1,5 +1,15 @@
 #!/usr/bin/env python3
-import sys
+# git-extract.py [--fresh] <fn> [<fn> ...]
+#
+# Extracts the history of one or more files of REPO_PATH into BLOBS_PATH.
+# All files share one commit cache (BLOBS_PATH/commits.cache, an append-only
+# log of commit -> author, parents and the blob of every extracted file), and
+# blobs that are already in BLOBS_PATH are not written again, so re-running
+# after new upstream commits only reads the new commits. The deps of commits
+# that are already in an existing order file are kept (including manual
+# corrections), unless --fresh is given; new deps are resolved from the
+# commit graph (see fill_deps), without asking.
+import argparse
 import git
 import json
 import os.path
@@ -10,18 +20,89 @@ from collections import defaultdict
 
 BLOBS_PATH = '/home/eeojun/git-blobs/'
 REPO_PATH = '/home/eeojun/code/repos/git/'
+CACHE_NAME = 'commits.cache'
+
+
+def order_path(fn):
+    return os.path.join(BLOBS_PATH, f'{slugify(fn)}.ord')
+
+
+def load_order(fn):
+    fn = order_path(fn)
+    if not os.path.exists(fn):
+        return []
+    with open(fn) as fp:
+        return json.load(fp)
 
 
 def store_order(fn, order):
-    fn = os.path.join(BLOBS_PATH, f'{slugify(fn)}.ord')
-    with open(fn, 'w') as fp:
+    fn = order_path(fn)
+    with open(fn + '.tmp', 'w') as fp:
         json.dump(order, fp)
+    os.replace(fn + '.tmp', fn)
 
 
 def store_blob(blob: git.Blob):
     fn = os.path.join(BLOBS_PATH, blob.hexsha)
-    with open(fn, 'wb') as fp:
+    if os.path.exists(fn):
+        return
+    with open(fn + '.tmp', 'wb') as fp:
         fp.write(zlib.compress(blob.data_stream.read()))
+    os.replace(fn + '.tmp', fn)
+
+
+class CommitCache:
+    # commit -> {'author', 'parents', 'blobs': {fn: blob hexsha or None}}
+    # Every line of the cache file is a (partial) record, later lines
+    # add blobs of newly extracted files to the same commit.
+    def __init__(self, repo: git.Repo, fn):
+        self.repo = repo
+        self.commits = {}
+        if os.path.exists(fn):
+            with open(fn) as fp:
+                for line in fp:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break  # truncated last line
+                    self._merge(rec)
+        self.fp = open(fn, 'a')
+
+    def _merge(self, rec):
+        info = self.commits.setdefault(rec['commit'], {'blobs': {}})
+        info['blobs'].update(rec.pop('blobs', {}))
+        info.update(rec)
+
+    def _write(self, rec):
+        self.fp.write(json.dumps(rec) + '\n')
+
+    def get(self, hexsha, fns=()):
+        info = self.commits.get(hexsha)
+        missing = [fn for fn in fns if info is None or fn not in info['blobs']]
+        if info is not None and not missing:
+            return info
+        commit = self.repo.commit(hexsha)
+        rec = {'commit': hexsha, 'blobs': {}}
+        if info is None:
+            rec['author'] = commit.author.email
+            rec['parents'] = [p.hexsha for p in commit.parents]
+        for fn in missing:
+            try:
+                blob = commit.tree[fn]
+            except KeyError:
+                rec['blobs'][fn] = None
+                continue
+            store_blob(blob)
+            rec['blobs'][fn] = blob.hexsha
+        self._write(rec)
+        self._merge(rec)
+        return self.commits[hexsha]
+
+    def blob(self, hexsha, fn):
+        return self.get(hexsha, [fn])['blobs'][fn]
+
+    def close(self):
+        self.fp.close()
 
 
 def fill_session_ids(order):
@@ -53,68 +134,105 @@ def fill_session_ids(order):
                 commits[other]['fid'] = fid
 
 
-def choice(arr, prompt):
-    if len(arr) == 1:
-        return arr[0]
-    for i, item in enumerate(arr, 1):
-        print(f' [{i}] {item}')
-    while True:
-        value = input(prompt + ' ')
-        value = value.strip()
-        if value.isnumeric() and 1 <= int(value) <= len(arr):
-            return arr[int(value) - 1]
-
-
-def fill_deps(repo: git.Repo, order, fn):
+def nearest(cache: CommitCache, start, candidates, index):
+    # BFS over the ancestors of `start` (itself included) for the closest
+    # commit in `candidates`. Ties (same distance) go to the commit that
+    # comes last in the order, so the result is deterministic.
+    seen = {start}
+    level = [start]
+    while level:
+        found = [c for c in level if c in candidates]
+        if found:
+            return max(found, key=index.__getitem__)
+        nxt = []
+        for c in level:
+            for p in cache.get(c)['parents']:
+                if p not in seen:
+                    seen.add(p)
+                    nxt.append(p)
+        level = nxt
+    return None
+
+
+def fill_deps(cache: CommitCache, order, fn):
+    # Only commits without deps (i.e. new ones) are resolved. The dep for
+    # every parent is the nearest ancestor of that parent (in the commit
+    # graph) among the earlier commits with the parent's blob.
+    index = {info['commit']: i for i, info in enumerate(order)}
     tips = defaultdict(list)
+    memo = {}
     for i, info in enumerate(order):
-        cm = repo.commit(info['commit'])
-        # if info['blob'] in tips:
-        #     print(tips[info['blob']][:10], '<->', cm.hexsha[:10])
-        tips[info['blob']].append(cm.hexsha)
-        info['deps'] = []
-        if i == 0:
-            continue
-        prompt = f'{cm.hexsha[:10]} depends on?'
-        info['deps'] = [choice(tips[c.tree[fn].hexsha], prompt) for c in cm.parents]
-
-
-def check_exists(fn):
-    order_fn = os.path.join(BLOBS_PATH, f'{slugify(fn)}.ord')
-    if os.path.exists(order_fn):
-        answer = input(f"file exists '{order_fn}', continue? (yes / [no]) ")
-        if answer.strip() == 'yes':
-            return True
-        return False
-    return True
+        if 'deps' not in info:
+            info['deps'] = []
+            for p in cache.get(info['commit'])['parents'] if i else []:
+                blob = cache.blob(p, fn)
+                cands = tips.get(blob, [])
+                if not cands:
+                    continue  # no earlier commit has the blob
+                if len(cands) == 1:
+                    dep = cands[0]
+                elif (p, blob) in memo:
+                    dep = memo[p, blob]
+                else:
+                    dep = memo[p, blob] = nearest(cache, p, set(cands), index)
+                    if dep is None:
+                        # blob came back on an unrelated branch
+                        dep = cands[-1]
+                        print(f'warning: {info["commit"][:10]}: no ancestor of'
+                              f' {p[:10]} has its blob, using {dep[:10]}')
+                if dep is not None:
+                    info['deps'].append(dep)
+        tips[info['blob']].append(info['commit'])
+
+
+def extract(repo: git.Repo, cache: CommitCache, fns, fresh=False):
+    # The commit list of every file comes from git itself (so history
+    # simplification is exactly that of `git log <fn>`), everything else
+    # is read once per commit for all files and cached.
+    lists = {fn: repo.git.rev_list('HEAD', '--topo-order', '--reverse', '--', fn).split()
+             for fn in fns}
+    for fn, commits in lists.items():
+        for hexsha in commits:
+            cache.get(hexsha, fns)
+
+    for fn, commits in lists.items():
+        old = {} if fresh else {info['commit']: info for info in load_order(fn)}
+        order = []
+        for hexsha in commits:
+            info = cache.get(hexsha)
+            if info['blobs'][fn] is None:
+                continue  # fn deleted (or not there yet), nothing to replay
+            entry = {
+                'author': info['author'],
+                'commit': hexsha,
+                'blob':   info['blobs'][fn],
+            }
+            if hexsha in old and old[hexsha]['blob'] == entry['blob']:
+                entry['deps'] = old[hexsha]['deps']
+            order.append(entry)
+
+        fill_deps(cache, order, fn)
+        # order.reverse()
+        fill_session_ids(order)
+        # order.reverse()
+        store_order(fn, order)
+        new = sum(1 for info in order if info['commit'] not in old)
+        print(f'{fn}: {len(order)} commits ({new} new)')
 
 
 def main():
-    repo = git.Repo(REPO_PATH)
-    fn = sys.argv[1]
-    if not check_exists(fn):
-        return
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fresh', action='store_true',
+                        help='ignore existing order files')
+    parser.add_argument('fns', nargs='+', metavar='fn')
+    args = parser.parse_args()
 
-    commits = list(repo.iter_commits(
-        paths=[fn],
-        topo_order=True,
-        reverse=True))
-
-    order = []
-    for commit in commits:
-        blob = commit.tree[fn]
-        store_blob(blob)
-        order.append({
-            'author': commit.author.email,
-            'commit': commit.hexsha,
-            'blob':   blob.hexsha,
-        })
-
-    fill_deps(repo, order, fn)
-    # order.reverse()
-    fill_session_ids(order)
-    # order.reverse()
-    store_order(fn, order)
+    repo = git.Repo(REPO_PATH)
+    cache = CommitCache(repo, os.path.join(BLOBS_PATH, CACHE_NAME))
+    try:
+        extract(repo, cache, args.fns, args.fresh)
+    finally:
+        cache.close()
 
 
 if __name__ == '__main__':
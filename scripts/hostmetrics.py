@@ -0,0 +1,203 @@
+# Host metrics sampled while a job runs (scripts/runner.py).
+#
+# Every SAMPLE_EVERY seconds the runner reads from /proc:
+#
+#   freq_mhz    mean clock of the cores the job is pinned to (/proc/cpuinfo)
+#   load1       1-minute load average of the host (/proc/loadavg)
+#   rss, hwm    resident and peak resident bytes of the job's node processes
+#   vol_ctxt,   voluntary and involuntary context switches, and minor and
+#   invol_ctxt, major page faults of the job's node processes, cumulative
+#   minflt,     over the job (the last values read of processes that have
+#   majflt      exited are kept)
+#   swap        pages swapped in and out on the host since the job started
+#               (/proc/vmstat)
+#
+# When the job succeeds, the series is written next to each of its result
+# files as `<result>.host` ({"t": [...], "freq_mhz": [...], ...}), and a
+# summary is added to their `configuration` block under `host`, with the
+# interference() seen while it ran (e.g. 'throttled swapping', '' if none).
+# That happens after the outputs are stored in the result cache, so results
+# restored from it carry no `host`, rather than the readings of another run:
+#
+#   $ sqlite3 results.db "select path from files
+#         where json_extract(meta, '$.configuration.host.interference') != ''"
+import json
+import os
+import re
+import shutil
+import time as _time
+
+
+SAMPLE_EVERY = 5
+SUFFIX = '.host'
+FIELDS = ['t', 'freq_mhz', 'load1', 'rss', 'hwm', 'vol_ctxt', 'invol_ctxt', 'minflt', 'majflt',
+          'swap']
+COUNTERS = ['vol_ctxt', 'invol_ctxt', 'minflt', 'majflt', 'swap']
+RESULT = re.compile(r'(^|/)res\d+/')
+CONFIGURATION = re.compile(rb'\s*\{\s*"configuration"\s*:\s*\{')
+HEAD = 4096
+# The job's cores ran below this fraction of their fastest clock
+THROTTLED = 0.9
+
+
+def cpu_mhz(cores):
+    # Mean clock of the given cores, None where /proc/cpuinfo has none
+    mhz = {}
+    try:
+        with open('/proc/cpuinfo') as fp:
+            cpu = None
+            for line in fp:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'processor':
+                    cpu = int(value)
+                elif key == 'cpu MHz':
+                    mhz[cpu] = float(value)
+    except OSError:
+        return None
+    values = [mhz[c] for c in cores if c in mhz] or list(mhz.values())
+    return round(sum(values) / len(values), 1) if values else None
+
+
+def load1():
+    with open('/proc/loadavg') as fp:
+        return float(fp.read().split()[0])
+
+
+def swapped():
+    # Pages swapped in and out since boot
+    with open('/proc/vmstat') as fp:
+        return sum(int(line.split()[1]) for line in fp
+                   if line.startswith(('pswpin ', 'pswpout ')))
+
+
+def node_processes(session):
+    # {pid: counters} of the node processes in the job's session
+    out = {}
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat') as fp:
+                stat = fp.read()
+            with open(f'/proc/{pid}/status') as fp:
+                status = dict(line.split(':', 1) for line in fp if ':' in line)
+        except OSError:
+            continue  # exited in the meantime
+        comm = stat[stat.index('(') + 1:stat.rindex(')')]
+        fields = stat[stat.rindex(')') + 2:].split()
+        if comm != 'node' or int(fields[3]) != session:
+            continue
+        out[int(pid)] = {
+            'rss':        int(status.get('VmRSS', '0 kB').split()[0]) * 1024,
+            'hwm':        int(status.get('VmHWM', '0 kB').split()[0]) * 1024,
+            'vol_ctxt':   int(status['voluntary_ctxt_switches']),
+            'invol_ctxt': int(status['nonvoluntary_ctxt_switches']),
+            'minflt':     int(fields[7]),
+            'majflt':     int(fields[9]),
+        }
+    return out
+
+
+class Sampler:
+    def __init__(self, session, cores):
+        self.session = session
+        self.cores = cores
+        self.start = _time.monotonic()
+        self.last = -SAMPLE_EVERY
+        self.seen = {}  # pid -> last counters read
+        self.hwm = 0
+        self.swap = None  # swapped() at the first sample
+        self.series = {f: [] for f in FIELDS}
+
+    def sample(self, now):
+        if now - self.last < SAMPLE_EVERY:
+            return
+        self.last = now
+        try:
+            procs = node_processes(self.session)
+            load = load1()
+            swap = swapped()
+        except OSError:
+            return  # no /proc
+        if self.swap is None:
+            self.swap = swap
+        self.seen.update(procs)
+        self.hwm = max([self.hwm] + [p['hwm'] for p in procs.values()])
+        row = {
+            't':        round(now - self.start, 1),
+            'freq_mhz': cpu_mhz(self.cores),
+            'load1':    load,
+            'rss':      sum(p['rss'] for p in procs.values()),
+            'hwm':      self.hwm,
+            'swap':     swap - self.swap,
+        }
+        for c in COUNTERS[:-1]:
+            row[c] = sum(p[c] for p in self.seen.values())
+        for f in FIELDS:
+            self.series[f].append(row[f])
+
+    def summary(self):
+        # Scalars only, analysis/results.py would read arrays as samples
+        s = self.series
+        out = {'samples': len(s['t']), 'every': SAMPLE_EVERY, 'cores': len(self.cores)}
+        if not s['t']:
+            out['interference'] = ''
+            return out
+        freq = [f for f in s['freq_mhz'] if f is not None]
+        if freq:
+            out['freq_mhz_min'] = min(freq)
+            out['freq_mhz_mean'] = round(sum(freq) / len(freq), 1)
+            out['freq_mhz_max'] = max(freq)
+        out['load1_mean'] = round(sum(s['load1']) / len(s['load1']), 2)
+        out['load1_max'] = max(s['load1'])
+        out['rss_max'] = max(s['rss'])
+        out['hwm'] = self.hwm
+        for c in COUNTERS:
+            out[c] = s[c][-1]
+        out['interference'] = ' '.join(interference(out))
+        return out
+
+
+def interference(summary):
+    # What could have disturbed the timings
+    out = []
+    if 'freq_mhz_min' in summary and \
+            summary['freq_mhz_min'] < THROTTLED * summary['freq_mhz_max']:
+        out.append('throttled')
+    if summary['load1_max'] > (os.cpu_count() or 1):
+        out.append('overloaded')
+    if summary['swap']:
+        out.append('swapping')
+    return out
+
+
+def annotate(fn, summary):
+    # Adds `host` to the configuration block of a result file, returns False
+    # if it has none
+    with open(fn, 'rb') as fp:
+        head = fp.read(HEAD)
+        m = CONFIGURATION.match(head)
+        if m is None:
+            return False
+        rest = head[m.end():]
+        sep = b'' if rest.lstrip().startswith(b'}') else b','
+        tmp = fn + '.tmp'
+        with open(tmp, 'wb') as out:
+            out.write(head[:m.end()])
+            out.write(b'\n    "host": ' + json.dumps(summary).encode() + sep)
+            out.write(rest)
+            shutil.copyfileobj(fp, out)
+    os.replace(tmp, fn)
+    return True
+
+
+def attach(job, sampler):
+    # Writes the series and summary next to/into the job's result files
+    summary = sampler.summary()
+    for out in job.outputs:
+        if not RESULT.search(out) or not os.path.isfile(out):
+            continue
+        if annotate(out, summary):
+            with open(out + SUFFIX, 'w') as fp:
+                json.dump(sampler.series, fp)
@@ -14,7 +14,7 @@ do
         numRevs=$(get_num_revs "$data")
         slug=$(slugify "$data")
         echo "$slug" "$numPeers" "$numRevs"
-        node scripts/wiki-causal.js ".wiki-revs/${data}" "$numRevs" "$numPeers" ".causal-traces/${slug}-${numPeers}.json" &
+        # revs2causal uses all cores itself
+        ./scripts/revs2causal ".wiki-revs/${data}" "$numPeers" "$numRevs" ".causal-traces/${slug}-${numPeers}.json"
     done
 done
-wait
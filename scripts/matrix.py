@@ -0,0 +1,163 @@
+# Declarative benchmark matrix for scripts/gen-jobs.py.
+#
+# Every entry lists everything the matrix can run (datasets, algorithms with
+# their number of repeats, and the combinations that cannot run), and which
+# part of it is selected by default. Instead of commenting lines in and out,
+# pick a different selection on the command line:
+#
+#   $ python scripts/gen-jobs.py -a RGA,Yjs -d all causal_traces_generate
+#
+# Jobs whose outputs are already up to date are skipped anyway (see
+# scripts/planner.py), so selecting more than needed is cheap.
+#
+# Besides the `cannot` lists below, cells whose jobs the runner killed as
+# infeasible (they would have run over their time limit, see
+# scripts/predict.py) are left out, until they are removed from INFEASIBLE.
+from collections import namedtuple
+
+import predict
+
+
+Cell = namedtuple('Cell', 'data alg repeats extra')
+
+ALL = 'all'
+
+# None: don't leave out the measured infeasible cells (gen-jobs.py --retry-infeasible)
+INFEASIBLE = predict.INFEASIBLE
+
+WIKI = [
+    'George_W._Bush',
+    'Wikipedia',
+    'List_of_WWE_personnel',
+    'United_States',
+    'Jesus',
+    'List_of_dramatic_television_series_with_LGBT_characters',
+    'Spring_Championship_of_Online_Poker',
+    '2017_in_home_video',
+    'List_of_Nintendo_Switch_games_A-F',
+    '2021_Kerala_Legislative_Assembly_election',
+]
+
+# dataset -> ids of the peers whose logs are replayed
+CAUSAL = {
+    'g1.json':   [1, 2, 3, 4, 5, 6, 9, 11, 12],
+    'g2.json':   [1, 2, 3, 4, 6, 7, 9, 10, 12, 13, 17, 19, 20, 22, 23, 25],
+    'g3.json':   [1, 3, 5, 6, 8, 10],
+    'doc1.json': [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 15, 16, 17, 18, 19, 20, 21, 22],
+    'doc2.json': [1, 2, 3, 4, 6, 10, 11, 12, 17, 19, 21, 23, 24],
+}
+
+GIT = [
+    'Documentation-diff-options-txt.ord',
+    'Documentation-git-branch-txt.ord',
+    'Documentation-git-checkout-txt.ord',
+    'Documentation-git-clone-txt.ord',
+    'Documentation-git-commit-txt.ord',
+    'Documentation-git-format-patch-txt.ord',
+    'Documentation-git-p4-txt.ord',
+    'Documentation-git-push-txt.ord',
+    'Documentation-git-read-tree-txt.ord',
+    'Documentation-git-rev-parse-txt.ord',
+    'Documentation-git-send-email-txt.ord',
+    'Documentation-git-submodule-txt.ord',
+]
+
+
+# Code each algorithm runs on, hashed by scripts/resultcache.py
+IMPLEMENTATIONS = {
+    'Automerge':      ['automerge'],
+    'Automerge+WASM': ['bench/automerge-pinned.js'],
+    'Logoot':         ['logoot'],
+    'Woot':           ['woot-crdt'],
+    'RGA':            ['RGA'],
+    'Treedoc':        ['treedoc'],
+    'LSEQ':           ['lseqtree'],
+    'DLS':            [],  # dotted-logootsplit, see package-lock.json
+    'Yjs':            [],  # yjs, see package-lock.json
+}
+
+
+def repeats(default, **special):
+    algs = ['Automerge', 'Automerge+WASM', 'Logoot', 'Woot', 'RGA',
+            'Treedoc', 'LSEQ', 'DLS', 'Yjs']
+    return {alg: special.get(alg.replace('+', '_'), default) for alg in algs}
+
+
+MATRIX = {
+    'microLTR_RTL': {
+        'datasets':   ['microLTR', 'microRTL'],
+        'algorithms': repeats(11),
+        'select':     {'algorithms': ['Logoot']},
+    },
+    'linear_traces': {
+        'datasets':   ['microLTR', 'microRTL', 'automerge'] + WIKI,
+        'algorithms': repeats(11),
+        'select':     {'algorithms': ['Logoot'],
+                       'datasets':   ['2017_in_home_video',
+                                      '2021_Kerala_Legislative_Assembly_election']},
+    },
+    'causal_traces_generate': {
+        'datasets':   CAUSAL,
+        'algorithms': repeats(10, Automerge=5, Automerge_WASM=5, Logoot=5, Woot=5),
+        'cannot':     {},
+        'select':     {'algorithms': ['RGA']},
+    },
+    'causal_traces_execute': {
+        'datasets':   CAUSAL,
+        'algorithms': repeats(11),
+        'cannot':     {'LSEQ': {'doc1.json', 'doc2.json', 'g1.json', 'g3.json'},
+                       'Woot': {'g2.json', 'g3.json', 'doc1.json'}},
+        'select':     {'algorithms': ['Logoot']},
+    },
+    'git_traces_generate': {
+        'datasets':   GIT,
+        'algorithms': repeats(10, Automerge=5, Logoot=5, Woot=5),
+        'cannot':     {'Automerge':      {'Documentation-diff-options-txt.ord'},
+                       'Automerge+WASM': set(GIT)},
+        'select':     {'algorithms': ['Logoot']},
+    },
+    'git_traces_execute': {
+        'datasets':   GIT,
+        'algorithms': repeats(11, Automerge=6, Logoot=6),
+        'cannot':     {'Automerge':      {'Documentation-diff-options-txt.ord'},
+                       'Automerge+WASM': set(GIT),
+                       'Woot':           {'Documentation-git-rev-parse-txt.ord',
+                                          'Documentation-git-send-email-txt.ord'}},
+        'select':     {'algorithms': ['Logoot']},
+    },
+    'user_ops': {
+        # dataset -> causal-traces document to run the user ops on
+        'datasets':   {data: f'.tmp/{{alg}}-{data}.json-causal-doc'
+                       for data in ['g1', 'g2', 'g3', 'doc1', 'doc2']},
+        'algorithms': repeats(11),
+        'cannot':     {'LSEQ': {'doc1', 'doc2', 'g1', 'g3'}},
+        'select':     {'algorithms': ['Logoot'], 'datasets': ['g2']},
+    },
+}
+
+
+def _pick(name, kind, wanted):
+    everything = list(MATRIX[name][kind])
+    if wanted is None:
+        wanted = MATRIX[name].get('select', {}).get(kind, ALL)
+    if wanted == ALL:
+        return everything
+    unknown = set(wanted) - set(everything)
+    if unknown:
+        raise ValueError(f'{name}: unknown {kind}: {", ".join(sorted(unknown))}')
+    return [x for x in everything if x in wanted]
+
+
+def cells(name, algorithms=None, datasets=None):
+    # algorithms/datasets: list of names, ALL, or None for the default
+    # selection of the matrix.
+    m = MATRIX[name]
+    measured = predict.infeasible(INFEASIBLE).get(name, {}) if INFEASIBLE else {}
+    cannot = {alg: set(m.get('cannot', {}).get(alg, ())) | measured.get(alg, set())
+              for alg in m['algorithms']}
+    extra = m['datasets'] if isinstance(m['datasets'], dict) else {}
+    for data in _pick(name, 'datasets', datasets):
+        for alg in _pick(name, 'algorithms', algorithms):
+            if data in cannot.get(alg, ()):
+                continue
+            yield Cell(data, alg, m['algorithms'][alg], extra.get(data))
@@ -0,0 +1,158 @@
+# Dependency-aware planning of the jobs of scripts/gen-jobs.py.
+#
+# Every job declares the files (or directories) it reads and writes. A job
+# depends on the jobs that write one of its inputs (or a directory holding
+# it), and is skipped when it is up to date:
+#
+#   - the journal says it completed, with the same command,
+#   - all of its outputs exist,
+#   - none of its inputs changed after it completed,
+#   - and none of the jobs it depends on has to run again.
+#
+# The journal (jobs/.journal) is an append-only log with one JSON line per
+# completed job, written by the local runner or at the end of every SLURM
+# script (`python scripts/planner.py done <job> <key>`), so an interrupted
+# sweep resumes with the jobs that did not complete.
+import json
+import os
+import sys
+import time as _time
+from hashlib import sha256
+
+
+JOURNAL = 'jobs/.journal'
+
+
+def job_key(job):
+    # Changing the command makes the job stale
+    return sha256(job.cmd.encode()).hexdigest()[:16]
+
+
+def read_journal(fn=JOURNAL):
+    # job name -> last completion record
+    done = {}
+    if not os.path.exists(fn):
+        return done
+    with open(fn) as fp:
+        for line in fp:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # truncated by a crash
+            done[rec['job']] = rec
+    return done
+
+
+def record(name, key, fn=JOURNAL):
+    rec = {'job': name, 'key': key, 'time': _time.time()}
+    with open(fn, 'a') as fp:
+        fp.write(json.dumps(rec) + '\n')
+
+
+def mtime(path):
+    # Latest modification of a file, or of a directory and its entries
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    latest = st.st_mtime
+    if os.path.isdir(path):
+        with os.scandir(path) as it:
+            for entry in it:
+                latest = max(latest, entry.stat().st_mtime)
+    return latest
+
+
+def _producer(path, outputs):
+    # The job writing `path`, or the directory that holds it
+    while path:
+        if path in outputs:
+            return outputs[path]
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return None
+
+
+def dependencies(jobs):
+    # job name -> names of the jobs it depends on
+    outputs = {}
+    for job in jobs:
+        for out in job.outputs:
+            out = os.path.normpath(out)
+            if out in outputs:
+                raise ValueError(f'{out} is written by both {outputs[out]} and {job.name}')
+            outputs[out] = job.name
+    deps = {}
+    for job in jobs:
+        deps[job.name] = []
+        for inp in job.inputs:
+            p = _producer(os.path.normpath(inp), outputs)
+            if p is not None and p != job.name and p not in deps[job.name]:
+                deps[job.name].append(p)
+    return deps
+
+
+def _toposort(jobs, deps):
+    by_name = {job.name: job for job in jobs}
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError('dependency cycle: ' + ' -> '.join(path + [name]))
+        state[name] = 'visiting'
+        for d in deps[name]:
+            visit(d, path + [name])
+        state[name] = 'done'
+        order.append(by_name[name])
+
+    for job in jobs:
+        visit(job.name, [])
+    return order
+
+
+def up_to_date(job, rec):
+    if rec is None or rec['key'] != job_key(job):
+        return False
+    if not all(os.path.exists(out) for out in job.outputs):
+        return False
+    for inp in job.inputs:
+        t = mtime(inp)
+        if t is not None and t > rec['time']:
+            return False
+    return True
+
+
+def plan(jobs, journal=JOURNAL, force=False):
+    # Returns the jobs that have to run, in dependency order and with their
+    # `deps` set (only to jobs that also run), and the skipped ones.
+    deps = dependencies(jobs)
+    done = {} if force else read_journal(journal)
+    run = []
+    skipped = []
+    rerun = set()
+    for job in _toposort(jobs, deps):
+        if (not any(d in rerun for d in deps[job.name])
+                and up_to_date(job, done.get(job.name))):
+            skipped.append(job)
+            continue
+        rerun.add(job.name)
+        run.append(job._replace(deps=tuple(d for d in deps[job.name] if d in rerun)))
+    return run, skipped
+
+
+def main():
+    cmd = sys.argv[1]
+    if cmd == 'done':
+        name, key = sys.argv[2:4]
+        record(name, key)
+    else:
+        raise SystemExit(f'unknown command: {cmd}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# Early abort of jobs that cannot finish within their time limit.
+#
+# The long-running benchmarks report their progress on stderr as
+#
+#   [progress] <done>/<total> <seconds since node started>
+#
+# (progress() in bench/utils.js: the local edits of a causal trace, the
+# commits of a git trace, the repeats of a replay). scripts/runner.py tails
+# every job's output, and once a job has run for MIN_FRACTION of its time
+# limit it fits the time since the first progress line of the current node
+# command as a power of the progress,
+#
+#   t(done) = a * done ** b
+#
+# on the later half of the progress lines (the first ones are dominated by
+# loading the trace and warming up), and extrapolates it to `total`. A job
+# that would run over its limit by more than SLACK is killed as infeasible,
+# and the extrapolation is appended to INFEASIBLE (JSON lines), which
+# scripts/matrix.py reads to extend the `cannot` lists of the matrix. Delete
+# the file, or its lines, to give cells another chance, e.g. after making a
+# CRDT faster.
+import json
+import math
+import os
+import re
+import time as _time
+
+
+INFEASIBLE = 'jobs/infeasible.jsonl'
+PROGRESS = re.compile(rb'^\[progress\] (\d+)/(\d+) (\d+(?:\.\d+)?)$', re.M)
+MIN_FRACTION = 0.05
+MIN_POINTS = 4
+SLACK = 0.25
+PREDICT_EVERY = 10
+
+
+def fit(points):
+    # (a, b) of t = a * done ** b, least squares in log-log space
+    xs = [math.log(d) for d, t in points]
+    ys = [math.log(t) for d, t in points]
+    n = len(xs)
+    mx, my = sum(xs) / n, sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    if sxx == 0:
+        return None
+    b = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+    return math.exp(my - b * mx), b
+
+
+class Progress:
+    # The progress lines of a job's output file, read as they are written
+    def __init__(self, fn):
+        self.fn = fn
+        self.offset = 0
+        self.partial = b''
+        self.total = None
+        self.start = None    # node's uptime at the first progress line
+        self.points = []     # (done, seconds since start)
+        self.checked = 0
+
+    def update(self):
+        try:
+            with open(self.fn, 'rb') as fp:
+                fp.seek(self.offset)
+                data = fp.read()
+        except FileNotFoundError:
+            return
+        self.offset += len(data)
+        data = self.partial + data
+        cut = data.rfind(b'\n') + 1
+        self.partial = data[cut:]
+        for m in PROGRESS.finditer(data[:cut]):
+            done, total, t = int(m.group(1)), int(m.group(2)), float(m.group(3))
+            if self.start is None or total != self.total or t < self.start:
+                # the (next) node command of the job started
+                self.total = total
+                self.start = t
+                self.points = []
+            if done > 0 and t > self.start:
+                self.points.append((done, t - self.start))
+
+    def predict(self, now, started, limit):
+        # The extrapolation if the job cannot finish within `limit` seconds
+        # from `started`, else None
+        if now - self.checked < PREDICT_EVERY:
+            return None
+        self.checked = now
+        self.update()
+        elapsed = now - started
+        if elapsed < MIN_FRACTION * limit or len(self.points) < MIN_POINTS:
+            return None
+        done = self.points[-1][0]
+        if done >= self.total:
+            return None
+        ab = fit(self.points[len(self.points) // 2:])
+        if ab is None:
+            return None
+        a, b = ab
+        remaining = max(a * self.total ** b - a * done ** b, 0)
+        projected = elapsed + remaining
+        if projected <= (1 + SLACK) * limit:
+            return None
+        return {
+            'done':      done,
+            'total':     self.total,
+            'elapsed':   round(elapsed, 1),
+            'projected': round(projected, 1),
+            'limit':     limit,
+            'fit':       {'a': a, 'b': b, 'points': len(self.points)},
+        }
+
+
+def record(job, extrapolation, fn=INFEASIBLE):
+    row = {'job': job.name, 'cell': job.cell, 'time': job.time,
+           'date': _time.strftime('%Y-%m-%dT%H:%M:%S'), **extrapolation}
+    os.makedirs(os.path.dirname(fn) or '.', exist_ok=True)
+    with open(fn, 'a') as fp:
+        fp.write(json.dumps(row) + '\n')
+
+
+def infeasible(fn=INFEASIBLE):
+    # {matrix: {alg: {data, ...}}} of the cells recorded as infeasible
+    out = {}
+    try:
+        fp = open(fn)
+    except FileNotFoundError:
+        return out
+    with fp:
+        for line in fp:
+            if not line.strip():
+                continue
+            cell = json.loads(line).get('cell')
+            if cell:
+                name, alg, data = cell
+                out.setdefault(name, {}).setdefault(alg, set()).add(data)
+    return out
@@ -0,0 +1,144 @@
+# Content-addressed cache for the results of benchmark jobs.
+#
+# The key of a job is the sha256 of everything that determines its results:
+#
+#   - the command (CLI options, repeats, output names, node binary),
+#   - the bench/*.js scripts it runs and the shared harness (HARNESS),
+#   - the implementation of the CRDT (`code`, see matrix.IMPLEMENTATIONS),
+#   - the contents of its inputs (traces, documents, logs).
+#
+# After a job succeeds its outputs are stored under the key in CACHE_DIR, and
+# a later job with the same key gets them copied back instead of running.
+# Only jobs whose outputs are all regular files are cached (res2/ results,
+# .tmp/ documents); jobs writing directories (CRUNCH_WD logs) always run.
+#
+#   $ python scripts/resultcache.py store <job file>    # from SLURM scripts
+import json
+import os
+import re
+import shutil
+import sys
+from hashlib import sha256
+
+import runner
+
+
+CACHE_DIR = '.result-cache'
+HARNESS = [
+    'bench/utils.js',
+    'bench/ctx_utils.js',
+    'bench/uconf.js',
+    'bench/format.js',
+    'crunch',
+    'package-lock.json',
+]
+SCRIPT = re.compile(r'\bbench/[\w./-]+\.js\b')
+
+_file_hashes = {}
+
+
+def _hash_file(path):
+    st = os.stat(path)
+    k = (path, st.st_size, st.st_mtime_ns)
+    if k not in _file_hashes:
+        h = sha256()
+        with open(path, 'rb') as fp:
+            for block in iter(lambda: fp.read(1 << 20), b''):
+                h.update(block)
+        _file_hashes[k] = h.hexdigest()
+    return _file_hashes[k]
+
+
+def _hash_path(h, path):
+    # Files by content, directories by their (sorted) files; a missing path
+    # still changes the key.
+    h.update(path.encode() + b'\0')
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d not in ('node_modules', '.git'))
+            for name in sorted(files):
+                fn = os.path.join(root, name)
+                h.update(f'{fn}\0{_hash_file(fn)}\0'.encode())
+    elif os.path.exists(path):
+        h.update(_hash_file(path).encode())
+    else:
+        h.update(b'-')
+
+
+def cacheable(job):
+    return bool(job.outputs)
+
+
+def job_key(job):
+    h = sha256()
+    h.update(job.cmd.encode() + b'\0')
+    scripts = sorted(set(SCRIPT.findall(job.cmd)))
+    for path in scripts + HARNESS + list(job.code) + list(job.inputs):
+        _hash_path(h, path)
+    return h.hexdigest()
+
+
+def _entry(key):
+    return os.path.join(CACHE_DIR, key[:2], key)
+
+
+def fetch(job):
+    # Copies the cached outputs of job into place, True on a hit
+    if not cacheable(job):
+        return False
+    d = _entry(job_key(job))
+    if not os.path.exists(os.path.join(d, 'outputs.json')):
+        return False
+    with open(os.path.join(d, 'outputs.json')) as fp:
+        outputs = json.load(fp)
+    if outputs != list(job.outputs):
+        return False
+    for i, out in enumerate(outputs):
+        if os.path.dirname(out):
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+        shutil.copyfile(os.path.join(d, str(i)), out + '.tmp')
+        os.replace(out + '.tmp', out)
+    return True
+
+
+def store(job):
+    # Call after job succeeded; returns the key, or None if not cached
+    if not cacheable(job) or not all(os.path.isfile(out) for out in job.outputs):
+        return None
+    key = job_key(job)
+    d = _entry(key)
+    if os.path.exists(os.path.join(d, 'outputs.json')):
+        return key
+    tmp = d + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for i, out in enumerate(job.outputs):
+        shutil.copyfile(out, os.path.join(tmp, str(i)))
+    with open(os.path.join(tmp, 'outputs.json'), 'w') as fp:
+        json.dump(list(job.outputs), fp)
+    os.replace(tmp, d)
+    return key
+
+
+def write_spec(job, fn):
+    with open(fn, 'w') as fp:
+        json.dump(job._asdict(), fp)
+
+
+def read_spec(fn):
+    with open(fn) as fp:
+        spec = json.load(fp)
+    return runner.Job(**{k: tuple(v) if isinstance(v, list) else v
+                         for k, v in spec.items()})
+
+
+def main():
+    cmd, fn = sys.argv[1:3]
+    if cmd == 'store':
+        store(read_spec(fn + '.spec'))
+    else:
+        raise SystemExit(f'unknown command: {cmd}')
+
+
+if __name__ == '__main__':
+    main()
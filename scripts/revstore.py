@@ -0,0 +1,241 @@
+# Per-page storage for downloaded Wikipedia revisions.
+#
+# Instead of one `.wiki-revs/{revid}.zlib` file per revision, all revisions
+# of a page go into a single archive next to the id file:
+#
+#   .wiki-revs/George_W._Bush_ids    revision ids, one per line
+#   .wiki-revs/George_W._Bush.revs   archive
+#
+# Archive layout:
+#
+#   header   MAGIC, u64 index offset, u64 index count, u64 reserved
+#   record*  u64 revid, u32 length, sha256(content), zlib(json(revision))
+#   index    (u64 revid, u64 offset, u32 length, sha256(content))*
+#
+# Index entries are sorted by revid, so a revision is found by binary search
+# over the memory-mapped index and decompressed on its own; the sha256 of the
+# page content is stored in both the record and the index, so it can be
+# looked up without decompressing anything. While a writer has the archive
+# open the header's index offset is 0; readers then rebuild the index by
+# scanning the records, which are self-describing. A crash can only leave a
+# truncated record at the end, which is dropped when appending again.
+#
+#   $ python scripts/revstore.py pack <ids-file>    # from old .zlib files
+#   $ python scripts/revstore.py index <archive>    # rebuild the index
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from hashlib import sha256
+
+
+MAGIC = b'WREVS\x00\x00\x02'
+HEADER = struct.Struct('<8sQQQ')
+RECORD = struct.Struct('<QI32s')
+ENTRY = struct.Struct('<QQI32s')
+REVS_DIR = '.wiki-revs'
+
+
+def read_ids(fn):
+    # Accepts both the old JSON list format and the line-per-id log.
+    with open(fn) as fp:
+        text = fp.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [int(x) for x in text.split()]
+
+
+def archive_path(ids_fn):
+    base = ids_fn[:-len('_ids')] if ids_fn.endswith('_ids') else ids_fn
+    return base + '.revs'
+
+
+def content_of(rev):
+    return rev.get('slots', {}).get('main', {}).get('content', '')
+
+
+def content_hash(content):
+    return sha256(content.encode()).digest()
+
+
+def _read_header(buf):
+    magic, index_offset, count, _ = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError('not a revision archive')
+    return index_offset, count
+
+
+def _scan(buf, end):
+    # (revid, offset, length, digest) for every complete record
+    pos = HEADER.size
+    while pos + RECORD.size <= end:
+        revid, length, digest = RECORD.unpack_from(buf, pos)
+        if pos + RECORD.size + length > end:
+            break
+        yield revid, pos + RECORD.size, length, digest
+        pos += RECORD.size + length
+
+
+class ArchiveWriter:
+    def __init__(self, fn, size=None):
+        # size: truncate the records to this many bytes (e.g. from a
+        # checkpoint), otherwise keep every complete record.
+        self.entries = {}
+        if not os.path.exists(fn) or size == 0:
+            with open(fn, 'wb') as fp:
+                fp.write(HEADER.pack(MAGIC, 0, 0, 0))
+        self.fp = open(fn, 'r+b')
+        mm = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset, count = _read_header(mm)
+        if index_offset and size in (None, index_offset):
+            records_end = index_offset
+            for i in range(count):
+                revid, *entry = ENTRY.unpack_from(mm, index_offset + i * ENTRY.size)
+                self.entries[revid] = tuple(entry)
+        else:
+            end = min(index_offset or len(mm), size or len(mm))
+            records_end = HEADER.size
+            for revid, offset, length, digest in _scan(mm, end):
+                self.entries[revid] = (offset, length, digest)
+                records_end = offset + length
+        mm.close()
+        # Mark the index as stale until close()
+        self.fp.seek(0)
+        self.fp.write(HEADER.pack(MAGIC, 0, 0, 0))
+        self.fp.truncate(records_end)
+        self.fp.seek(records_end)
+
+    def append(self, revid, rev):
+        data = zlib.compress(json.dumps(rev).encode('utf8'))
+        digest = content_hash(content_of(rev))
+        self.fp.write(RECORD.pack(revid, len(data), digest))
+        self.entries[revid] = (self.fp.tell(), len(data), digest)
+        self.fp.write(data)
+
+    def sync(self):
+        # Returns the end of the records, to be used as `size` later
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        return self.fp.tell()
+
+    def close(self):
+        index_offset = self.sync()
+        for revid in sorted(self.entries):
+            offset, length, digest = self.entries[revid]
+            self.fp.write(ENTRY.pack(revid, offset, length, digest))
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.fp.seek(0)
+        self.fp.write(HEADER.pack(MAGIC, index_offset, len(self.entries), 0))
+        self.fp.close()
+
+
+class Archive:
+    def __init__(self, fn):
+        with open(fn, 'rb') as fp:
+            self.mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset, self.count = _read_header(self.mm)
+        if index_offset:
+            self.index = memoryview(self.mm)[index_offset:index_offset + self.count * ENTRY.size]
+        else:
+            # Writer still open (or crashed): rebuild the index in memory
+            entries = {revid: (offset, length, digest)
+                       for revid, offset, length, digest in _scan(self.mm, len(self.mm))}
+            self.index = bytearray()
+            for revid in sorted(entries):
+                self.index += ENTRY.pack(revid, *entries[revid])
+            self.count = len(entries)
+
+    def _find(self, revid):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            [key] = struct.unpack_from('<Q', self.index, mid * ENTRY.size)
+            if key < revid:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            entry = ENTRY.unpack_from(self.index, lo * ENTRY.size)
+            if entry[0] == revid:
+                return entry
+        raise KeyError(revid)
+
+    def __contains__(self, revid):
+        try:
+            self._find(revid)
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        for revid, _, _, _ in ENTRY.iter_unpack(self.index):
+            yield revid
+
+    def get(self, revid):
+        _, offset, length, _ = self._find(revid)
+        return json.loads(zlib.decompress(self.mm[offset:offset + length]).decode('utf-8'))
+
+    def hash(self, revid):
+        return self._find(revid)[3].hex()
+
+    def close(self):
+        if isinstance(self.index, memoryview):
+            self.index.release()
+        self.mm.close()
+
+
+class Revisions:
+    # Read access to the revisions of a page, from its archive if there
+    # is one, otherwise from the old one-file-per-revision layout.
+    def __init__(self, ids_fn, revs_dir=REVS_DIR):
+        self.revs_dir = revs_dir
+        fn = archive_path(ids_fn)
+        self.archive = Archive(fn) if os.path.exists(fn) else None
+
+    def get(self, revid):
+        if self.archive is not None:
+            return self.archive.get(revid)
+        fn = os.path.join(self.revs_dir, f'{revid}.zlib')
+        with open(fn, 'rb') as fp:
+            return json.loads(zlib.decompress(fp.read()).decode('utf-8'))
+
+    def content(self, revid):
+        return content_of(self.get(revid))
+
+    def hash(self, revid):
+        # hex sha256 of the content, without decompressing when possible
+        if self.archive is not None:
+            return self.archive.hash(revid)
+        return content_hash(self.content(revid)).hex()
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+
+def pack(ids_fn, revs_dir=REVS_DIR):
+    fn = archive_path(ids_fn)
+    writer = ArchiveWriter(fn, size=0)
+    for revid in read_ids(ids_fn):
+        with open(os.path.join(revs_dir, f'{revid}.zlib'), 'rb') as fp:
+            rev = json.loads(zlib.decompress(fp.read()).decode('utf-8'))
+        writer.append(revid, rev)
+    writer.close()
+    return fn
+
+
+def main():
+    cmd, fn = sys.argv[1:3]
+    if cmd == 'pack':
+        print(pack(fn, *sys.argv[3:]))
+    elif cmd == 'index':
+        ArchiveWriter(fn).close()
+    else:
+        raise SystemExit(f'unknown command: {cmd}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# A simple rope for replaying splice-style edits on large documents.
+#
+# The text is kept as a list of chunks (each at most 2 * CHUNK characters)
+# plus a Fenwick tree over the chunk lengths, so finding the chunk that holds
+# a position is O(log #chunks) and an edit only copies one chunk. Replaying
+# per-character ops on a Python list (list.insert / del) is O(n) per op,
+# which is quadratic over a whole trace.
+
+
+CHUNK = 1024
+
+
+class Rope:
+    def __init__(self, text=''):
+        self.chunks = [text[i:i + CHUNK] for i in range(0, len(text), CHUNK)] or ['']
+        self._rebuild()
+
+    def _rebuild(self):
+        chunks = self.chunks
+        n = len(chunks)
+        tree = [0] * (n + 1)
+        for i in range(1, n + 1):
+            tree[i] += len(chunks[i - 1])
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self.tree = tree
+        self.length = sum(map(len, chunks))
+        self.empty = chunks.count('')
+        self.top = 1 << (n.bit_length() - 1) if n else 0
+
+    def _add(self, k, delta):
+        tree = self.tree
+        n = len(tree) - 1
+        k += 1
+        while k <= n:
+            tree[k] += delta
+            k += k & -k
+        self.length += delta
+
+    def _find(self, pos, strict):
+        # Index of the chunk holding `pos`, and the offset into it.
+        # strict: for inserts, prefer the end of a chunk over the start of
+        # the next one.
+        tree = self.tree
+        n = len(tree) - 1
+        idx = 0
+        step = self.top
+        while step:
+            nxt = idx + step
+            if nxt <= n:
+                v = tree[nxt]
+                if v < pos or (not strict and v == pos):
+                    idx = nxt
+                    pos -= v
+            step >>= 1
+        return idx, pos
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return ''.join(self.chunks)
+
+    def insert(self, pos, text):
+        if not 0 <= pos <= self.length:
+            raise IndexError(f'insert at {pos} out of bounds (length {self.length})')
+        if not text:
+            return
+        k, off = self._find(pos, True)
+        c = self.chunks[k]
+        c = c[:off] + text + c[off:]
+        if len(c) <= 2 * CHUNK:
+            if not self.chunks[k]:
+                self.empty -= 1
+            self.chunks[k] = c
+            self._add(k, len(text))
+        else:
+            self.chunks[k:k + 1] = [c[i:i + CHUNK] for i in range(0, len(c), CHUNK)]
+            self._rebuild()
+
+    def delete(self, pos, count=1):
+        if pos < 0 or count < 0 or pos + count > self.length:
+            raise IndexError(f'delete {count} at {pos} out of bounds (length {self.length})')
+        while count > 0:
+            k, off = self._find(pos, False)
+            c = self.chunks[k]
+            take = min(count, len(c) - off)
+            c = c[:off] + c[off + take:]
+            self.chunks[k] = c
+            self._add(k, -take)
+            count -= take
+            if not c:
+                self.empty += 1
+        if self.empty > 64 and 2 * self.empty > len(self.chunks):
+            self.chunks = [c for c in self.chunks if c] or ['']
+            self._rebuild()
+
+    def splice(self, op):
+        # op is [idx, 0, text] (insert) or [idx, count] (delete)
+        if op[1]:
+            self.delete(op[0], op[1])
+        else:
+            self.insert(op[0], op[2])
@@ -0,0 +1,168 @@
+# Local execution backend for the jobs of scripts/gen-jobs.py.
+#
+# Instead of writing SLURM scripts, every job is run here on a pool of cores:
+# a job asking for `cc` cores (--cpus-per-task) only starts once that many
+# cores are free, it is pinned to exactly those cores (sched_setaffinity, so
+# concurrent jobs don't migrate onto each other's cores and add timing
+# noise), and it is killed when it runs over its `time` limit. A job with
+# `deps` only starts once all of them succeeded (see scripts/planner.py), and
+# is skipped if one of them failed. The commands are the same shell commands
+# as in the SLURM scripts, so results still end up in res2/ etc. Each job's
+# stdout/stderr goes to `<job file>.out`, which is also tailed for progress
+# to kill jobs early that would run over their limit (see scripts/predict.py).
+# While a job runs, host metrics are sampled from /proc and attached to its
+# results (see scripts/hostmetrics.py).
+import os
+import signal
+import subprocess
+import sys
+import time as _time
+from collections import namedtuple
+
+import hostmetrics
+import predict
+
+
+# cell: (matrix, alg, data) of scripts/matrix.py the job belongs to
+Job = namedtuple('Job', 'name cmd cc time inputs outputs deps code cell',
+                 defaults=((), (), (), (), None))
+
+
+def parse_time(s):
+    # SLURM time limit: [D-]HH:MM:SS, MM:SS or MM -> seconds
+    days = 0
+    if '-' in s:
+        d, s = s.split('-', 1)
+        days = int(d)
+    parts = [int(x) for x in s.split(':')]
+    if len(parts) == 1:
+        parts = [0, parts[0], 0]
+    elif len(parts) == 2:
+        parts = [0] + parts
+    h, m, sec = parts
+    return ((days * 24 + h) * 60 + m) * 60 + sec
+
+
+def available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+class Running:
+    def __init__(self, job, cores):
+        self.job = job
+        self.cores = cores
+        self.start = _time.monotonic()
+        self.limit = parse_time(job.time)
+        self.deadline = self.start + self.limit
+        self.killed = None
+        self.out = open(job.name + '.out', 'w')
+        self.progress = predict.Progress(job.name + '.out')
+        self.extrapolation = None
+
+        def pin():
+            if hasattr(os, 'sched_setaffinity'):
+                os.sched_setaffinity(0, cores)
+
+        self.proc = subprocess.Popen(
+            ['bash', '-c', job.cmd],
+            stdout=self.out,
+            stderr=subprocess.STDOUT,
+            preexec_fn=pin,
+            start_new_session=True,
+        )
+        self.host = hostmetrics.Sampler(self.proc.pid, cores)
+
+    def kill(self, status='timeout'):
+        self.killed = status
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def elapsed(self):
+        return _time.monotonic() - self.start
+
+
+def run(jobs, cores=None, poll=0.5, on_done=None, cached=None):
+    # Runs the jobs (first-fit in the given order, once their deps are done)
+    # and returns the list of (job, status) that failed, timed out, were
+    # killed as infeasible (recorded with predict.record()) or were
+    # skipped. on_done(job) is called for every job that succeeded. When
+    # cached(job) returns True as the job becomes ready, it counts as done
+    # without running (see scripts/resultcache.py).
+    cores = list(cores or available_cores())
+    free = set(cores)
+    pending = list(jobs)
+    running = []
+    failed = []
+    try:
+        _run(pending, running, failed, cores, free, poll, on_done, cached)
+    except KeyboardInterrupt:
+        for r in running:
+            r.kill()
+        raise
+    return failed
+
+
+def _run(pending, running, failed, cores, free, poll, on_done, cached):
+    waiting = {job.name for job in pending}
+    bad = set()
+    while pending or running:
+        for job in list(pending):
+            if any(d in bad for d in job.deps):
+                pending.remove(job)
+                bad.add(job.name)
+                failed.append((job, 'dependency failed'))
+                print(f'[skip]  {job.name}: dependency failed', file=sys.stderr)
+                continue
+            if any(d in waiting for d in job.deps):
+                continue
+            if cached is not None and cached(job):
+                pending.remove(job)
+                waiting.discard(job.name)
+                print(f'[cache] {job.name}', file=sys.stderr)
+                if on_done is not None:
+                    on_done(job)
+                continue
+            cc = min(job.cc, len(cores))
+            if cc <= len(free):
+                mine = sorted(free)[:cc]
+                free.difference_update(mine)
+                pending.remove(job)
+                running.append(Running(job, mine))
+                print(f'[start] {job.name} on cores {mine}', file=sys.stderr)
+
+        _time.sleep(poll)
+        now = _time.monotonic()
+        for r in list(running):
+            if r.proc.poll() is None:
+                r.host.sample(now)
+                if now > r.deadline:
+                    r.kill()
+                elif r.job.cell is not None:
+                    r.extrapolation = r.progress.predict(now, r.start, r.limit)
+                    if r.extrapolation is not None:
+                        r.kill('infeasible')
+                continue
+            r.out.close()
+            running.remove(r)
+            free.update(r.cores)
+            rc = r.proc.returncode
+            status = r.killed or f'rc={rc}'
+            print(f'[done]  {r.job.name} {status} {r.elapsed():.0f}s', file=sys.stderr)
+            if r.killed == 'infeasible':
+                e = r.extrapolation
+                print(f"[abort] {r.job.name}: {e['done']}/{e['total']} after"
+                      f" {e['elapsed']:.0f}s, projected {e['projected']:.0f}s"
+                      f" > {e['limit']}s", file=sys.stderr)
+                predict.record(r.job, e)
+            if r.killed or rc != 0:
+                bad.add(r.job.name)
+                failed.append((r.job, r.killed or rc))
+            else:
+                waiting.discard(r.job.name)
+                if on_done is not None:
+                    on_done(r.job)  # before attach(), not to cache this run's host
+                hostmetrics.attach(r.job, r.host)
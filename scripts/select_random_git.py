@@ -1,3 +1,5 @@
+# Random replay ids for GIT_INTERESTED in scripts/gen-jobs.py; see
+# `scripts/traceindex.py select` for ids covering the expensive sessions.
 import random
 import json
 import os.path
@@ -0,0 +1,25 @@
+import ctrace
+from rope import Rope
+
+
+def replay(ops):
+    doc = Rope()
+    ctrace.apply(doc, ctrace.coalesce(ops))
+    return str(doc)
+
+
+def test_coalesce_single_chars():
+    ops = [[0, 0, 'a'], [1, 0, 'b'], [2, 0, 'c'], [2, 1], [1, 1]]
+    assert ctrace.coalesce(ops) == [(0, 0, 'abc'), (1, 1, 2)]
+    assert replay(ops) == 'a'
+
+
+def test_coalesce_multi_char_inserts():
+    assert replay([[0, 0, 'ab'], [1, 0, 'c']]) == 'acb'
+    assert replay([[0, 0, 'ab'], [2, 0, 'cd'], [4, 0, 'e']]) == 'abcde'
+    assert ctrace.coalesce([[0, 0, 'ab'], [2, 0, 'c']]) == [(0, 0, 'abc')]
+
+
+def test_expand_roundtrip():
+    runs = [(0, 0, 'hello'), (1, 1, 3), (0, 2, 'xy')]
+    assert ctrace.coalesce(list(ctrace.expand(runs))) == runs
@@ -0,0 +1,329 @@
+# Index of what makes the git and causal traces expensive to replay.
+#
+#   $ python scripts/traceindex.py index .causal-traces /home/eeojun/git-blobs
+#   $ python scripts/traceindex.py select -n 10 --by window
+#   ['Documentation-diff-options-txt.ord', [3, 12, 17, ...]]
+#
+# Reads every git order file (`.ord`, see scripts/git-extract.py) and causal
+# trace (xmltrace2json `.json`) once, and stores features per trace and per
+# session in an SQLite database (traces.db):
+#
+#   ops           commits (git) or ops (causal)
+#   ins, del      chars inserted and deleted (git: from line diffs of the
+#   delete_ratio  blobs next to the .ord file, NULL without them)
+#   forks         git: commits with more than one dependent; causal: ops
+#                 starting a stretch concurrent with other replicas
+#   merges        git: commits with more than one dep; causal: ops whose
+#                 clock took in ops of other replicas since the author's last
+#   width         most concurrent branches (git: live heads of the commit
+#                 graph; causal: replicas with ops the author had not seen)
+#   window        largest concurrent-op window (git: commits on only some of
+#                 the sides of a merge; causal: ops of other replicas not in
+#                 an op's causal past when it was made)
+#
+# A session is what a replay id replays: a peer `author fid` of a git trace,
+# numbered like createDocs() in bench/git.js, or a replica of a causal trace.
+# `select` picks replay ids that cover the expensive sessions instead of a
+# random sample (scripts/select_random_git.py): the top half by --by, and the
+# rest spread evenly over the remaining ranking. Like analysis/db.py, `index`
+# skips files whose size and mtime did not change.
+import argparse
+import difflib
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from collections import defaultdict
+
+from checktrace import decoded_clocks, is_causal
+
+
+DB = 'traces.db'
+DIRS = ['.causal-traces', '/home/eeojun/git-blobs']
+FEATURES = ['ops', 'ins', 'del', 'delete_ratio', 'forks', 'merges', 'width', 'window']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS traces (
+    path          TEXT PRIMARY KEY,
+    size          INTEGER,
+    mtime_ns      INTEGER,
+    kind          TEXT,
+    error         TEXT,
+    sessions      INTEGER,
+    ops           INTEGER,
+    ins           INTEGER,
+    del           INTEGER,
+    delete_ratio  REAL,
+    forks         INTEGER,
+    merges        INTEGER,
+    width         INTEGER,
+    window        INTEGER
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    path          TEXT NOT NULL REFERENCES traces(path),
+    session       INTEGER,
+    label         TEXT,
+    ops           INTEGER,
+    ins           INTEGER,
+    del           INTEGER,
+    delete_ratio  REAL,
+    forks         INTEGER,
+    merges        INTEGER,
+    width         INTEGER,
+    window        INTEGER,
+    PRIMARY KEY (path, session)
+);
+'''
+
+
+def connect(fn=DB):
+    conn = sqlite3.connect(fn)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class Features:
+    def __init__(self, label=None):
+        self.label = label
+        self.ops = self.forks = self.merges = self.width = self.window = 0
+        self.ins = self.dels = 0
+
+    def add(self, other):
+        self.ops += other.ops
+        self.forks += other.forks
+        self.merges += other.merges
+        self.width = max(self.width, other.width)
+        self.window = max(self.window, other.window)
+        if self.ins is not None:
+            self.ins = None if other.ins is None else self.ins + other.ins
+            self.dels = None if other.dels is None else self.dels + other.dels
+
+    def row(self):
+        changed = None if self.ins is None else self.ins + self.dels
+        ratio = self.dels / changed if changed else None
+        return [self.ops, self.ins, self.dels, ratio, self.forks, self.merges,
+                self.width, self.window]
+
+
+def popcount(x):
+    return bin(x).count('1')
+
+
+def blob_text(blobs, sha):
+    # None if the blob is not there
+    if sha is None:
+        return ''
+    try:
+        with open(os.path.join(blobs, sha), 'rb') as fp:
+            return zlib.decompress(fp.read()).decode('utf-8', 'replace')
+    except FileNotFoundError:
+        return None
+
+
+def changed_chars(old, new):
+    # (inserted, deleted) chars of a line diff
+    ins = dels = 0
+    a, b = old.splitlines(True), new.splitlines(True)
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag != 'equal':
+            dels += sum(map(len, a[i1:i2]))
+            ins += sum(map(len, b[j1:j2]))
+    return ins, dels
+
+
+def git_features(order, blobs):
+    # {session id: Features} of a git order
+    ids = {}
+    for item in reversed(order):  # as createDocs() in bench/git.js
+        ids.setdefault(f"{item['author']} {item['fid']}", len(ids) + 1)
+    index = {item['commit']: i for i, item in enumerate(order)}
+    dependents = defaultdict(int)
+    for item in order:
+        for dep in item['deps']:
+            dependents[dep] += 1
+    # Later commits using a commit as a dep, and as their first dep (diffed
+    # against): ancestor sets and texts are dropped after their last use, so
+    # only those of the live heads are kept
+    uses = defaultdict(int)
+    base_uses = defaultdict(int)
+    for item in order:
+        deps = [index[d] for d in item['deps'] if d in index]
+        for d in deps:
+            uses[d] += 1
+        if deps:
+            base_uses[deps[0]] += 1
+
+    sessions = {i: Features(key) for key, i in ids.items()}
+    ancestors = {}
+    heads = set()
+    texts = {}
+    for i, item in enumerate(order):
+        f = Features()
+        f.ops = 1
+        deps = [index[d] for d in item['deps'] if d in index]
+        anc = 1 << i
+        for d in deps:
+            anc |= ancestors[d]
+        heads.difference_update(deps)
+        heads.add(i)
+        f.width = len(heads)
+        f.forks = int(dependents[item['commit']] > 1)
+        if len(deps) > 1:
+            f.merges = 1
+            common = ancestors[deps[0]]
+            for d in deps[1:]:
+                common &= ancestors[d]
+            f.window = popcount((anc & ~(1 << i)) & ~common)
+        text = blob_text(blobs, item['blob'])
+        base = texts[deps[0]] if deps else ''
+        if text is None or base is None:
+            f.ins = f.dels = None
+        else:
+            f.ins, f.dels = changed_chars(base, text)
+        for d in deps:
+            uses[d] -= 1
+            if not uses[d]:
+                del ancestors[d]
+        if deps:
+            base_uses[deps[0]] -= 1
+            if not base_uses[deps[0]]:
+                del texts[deps[0]]
+        if uses[i]:
+            ancestors[i] = anc
+        if base_uses[i]:
+            texts[i] = text
+        sessions[ids[f"{item['author']} {item['fid']}"]].add(f)
+    return sessions
+
+
+def causal_features(ops):
+    # {replica: Features} of a causal trace
+    sessions = {}
+    count = defaultdict(int)  # ops made so far by every replica
+    last_vc = {}
+    behind = {}
+    for author, vc, edit in ops:
+        vc = {int(r): c for r, c in vc.items()}
+        s = sessions.setdefault(author, Features(str(author)))
+        f = Features()
+        f.ops = 1
+        unseen = {r: n - vc.get(r, 0) for r, n in count.items()
+                  if r != author and n > vc.get(r, 0)}
+        f.width = 1 + len(unseen)
+        f.window = sum(unseen.values())
+        if unseen and not behind.get(author):
+            f.forks = 1
+        behind[author] = bool(unseen)
+        prev = last_vc.get(author)
+        if prev is not None and any(c > prev.get(r, 0) for r, c in vc.items() if r != author):
+            f.merges = 1
+        last_vc[author] = vc
+        f.ins, f.dels = len(edit[2]) if edit[1] == 0 else 0, edit[1]
+        count[author] += 1
+        s.add(f)
+    return sessions
+
+
+def read(path):
+    # (kind, {session: Features}), kind None if not a trace
+    with open(path) as fp:
+        data = json.load(fp)
+    if path.endswith('.ord'):
+        return 'git', git_features(data, os.path.dirname(path))
+    if is_causal(data):
+        return 'causal', causal_features(decoded_clocks(data))
+    return None, {}
+
+
+def trace_files(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        if not os.path.isdir(path):
+            print(f'{path}: not found', file=sys.stderr)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(('.ord', '.json')):
+                    yield os.path.join(root, name)
+
+
+def index_file(conn, path):
+    # Returns True if the file was (re-)indexed, False if unchanged
+    st = os.stat(path)
+    row = conn.execute('SELECT size, mtime_ns FROM traces WHERE path = ?', (path,)).fetchone()
+    if row == (st.st_size, st.st_mtime_ns):
+        return False
+    try:
+        kind, sessions = read(path)
+        error = None
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        kind, sessions, error = None, {}, str(e)
+    total = Features()
+    for f in sessions.values():
+        total.add(f)
+    with conn:
+        conn.execute('DELETE FROM sessions WHERE path = ?', (path,))
+        conn.execute('INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (path, st.st_size, st.st_mtime_ns, kind, error, len(sessions),
+                      *total.row()))
+        conn.executemany('INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         [(path, i, f.label, *f.row()) for i, f in sorted(sessions.items())])
+    return True
+
+
+def index(conn, paths=DIRS):
+    done = unchanged = 0
+    for path in trace_files(paths):
+        if index_file(conn, path):
+            done += 1
+            print(f'indexed {path}', file=sys.stderr)
+        else:
+            unchanged += 1
+    return done, unchanged
+
+
+def select(conn, path, n=10, by='window'):
+    # n session ids of a trace: the top half by `by`, the rest spread
+    # evenly over the remaining ranking
+    ranked = [i for [i] in conn.execute(
+        f'SELECT session FROM sessions WHERE path = ?'
+        f' ORDER BY "{by}" DESC, ops DESC, session', (path,))]
+    if len(ranked) <= n:
+        return sorted(ranked)
+    top = (n + 1) // 2
+    rest = ranked[top:]
+    k = n - top
+    step = (len(rest) - 1) / max(k - 1, 1)
+    return sorted(ranked[:top] + [rest[round(j * step)] for j in range(k)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--db', default=DB)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('index', help='add new and changed traces')
+    p.add_argument('paths', nargs='*', default=DIRS)
+    p = sub.add_parser('select', help='replay ids covering the expensive sessions')
+    p.add_argument('-n', type=int, default=10)
+    p.add_argument('--by', choices=FEATURES, default='window')
+    p.add_argument('--kind', default='git', help="'git' or 'causal'")
+    p.add_argument('traces', nargs='*', help='paths as indexed (default: all of --kind)')
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.cmd == 'index':
+        done, unchanged = index(conn, args.paths)
+        print(f'{done} indexed, {unchanged} unchanged', file=sys.stderr)
+    elif args.cmd == 'select':
+        traces = args.traces or [p for [p] in conn.execute(
+            'SELECT path FROM traces WHERE kind = ? ORDER BY path', (args.kind,))]
+        for path in traces:
+            print([os.path.basename(path), select(conn, path, args.n, args.by)])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,236 @@
-import time
-import requests
+# Download the revision history of Wikipedia pages.
+#
+#   $ python scripts/wiki.py [-j 4] 'George W. Bush' 'Jesus' ...
+#
+# Pages are fetched concurrently by a bounded pool of workers (one HTTP
+# session each); the revisions of a single page are still fetched in order,
+# following the API's continuation tokens. Per page we keep:
+#
+#   .wiki-revs/{slug}_ids   append-only revision id log (one id per line)
+#   .wiki-revs/{slug}.revs  revision archive (see scripts/revstore.py)
+#   .wiki-revs/{slug}.ckpt  last continuation token + sizes of the above
+#
+# The checkpoint is written after each batch, so an interrupted run picks up
+# where it stopped. Use --mock to run against a local fake API server.
+import argparse
+import asyncio
 import json
-import zlib
+import os
+import random
 import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
 import slugify
 
-# page_name = 'George W. Bush'
-target = 500
-page_name = sys.argv[1]
-session = requests.Session()
-url = "http://en.wikipedia.org/w/api.php"
-params = {
+import revstore
+
+
+URL = "http://en.wikipedia.org/w/api.php"
+PARAMS = {
     "action": "query",
     "prop": "revisions",
-    "titles": page_name,
     "rvprop": "ids|timestamp|content",
     "rvslots": "main",
     "rvdir": "newer",
-    "rvlimit": 20,
+    "rvlimit": 50,  # maximum when fetching content
     "format": "json",
     "formatversion": "2",
 }
 
-ids_fn = f'.wiki-revs/{slugify.slugify_filename(page_name)}_ids'
-ids = []
-try:
-    ids = json.load(open(ids_fn, 'r'))
-except FileNotFoundError:
-    pass
-
-while True:
-    r = session.get(url, params=params)
-    r.raise_for_status()
-    data = r.json()
-
-    for page in data["query"]["pages"]:
-        print(page["title"])
-        if page["title"] != page_name:
-            continue
-        for rev in page["revisions"]:
-            ids.append(rev['revid'])
-            with open(f'.wiki-revs/{rev["revid"]}.zlib', 'wb') as fp:
-                b = zlib.compress(json.dumps(rev).encode('utf8'))
-                fp.write(b)
-        open(ids_fn, 'w').write(json.dumps(ids))
-
-    if "continue" not in data:
-        break
-    print(data["continue"]["rvcontinue"])
-    params["rvcontinue"] = data["continue"]["rvcontinue"]
-    print(len(ids))
-    if len(ids) >= target:
-        break
-    time.sleep(1)
+
+class Page:
+    def __init__(self, title, out_dir):
+        slug = slugify.slugify_filename(title)
+        self.title = title
+        self.ids_fn = os.path.join(out_dir, f'{slug}_ids')
+        self.archive_fn = revstore.archive_path(self.ids_fn)
+        self.ckpt_fn = os.path.join(out_dir, f'{slug}.ckpt')
+        self.ckpt = None
+        self.count = 0
+
+    def open(self):
+        try:
+            with open(self.ckpt_fn) as fp:
+                self.ckpt = json.load(fp)
+        except FileNotFoundError:
+            if os.path.exists(self.ids_fn) and os.path.getsize(self.ids_fn):
+                raise RuntimeError(f'{self.ids_fn} exists but has no checkpoint;'
+                                   f' remove it to download again')
+            self.ckpt = {'rvcontinue': None, 'count': 0,
+                         'ids_size': 0, 'archive_size': 0, 'done': False}
+        # Drop anything written after the last checkpoint.
+        self.writer = revstore.ArchiveWriter(self.archive_fn, self.ckpt['archive_size'])
+        self.ids_fp = open(self.ids_fn, 'a+b')
+        self.ids_fp.truncate(self.ckpt['ids_size'])
+        self.count = self.ckpt['count']
+
+    def append(self, revs):
+        for rev in revs:
+            self.writer.append(rev['revid'], rev)
+            self.ids_fp.write(f'{rev["revid"]}\n'.encode())
+        self.count += len(revs)
+
+    def checkpoint(self, rvcontinue, done):
+        self.ids_fp.flush()
+        os.fsync(self.ids_fp.fileno())
+        self.ckpt = {
+            'rvcontinue':   rvcontinue,
+            'count':        self.count,
+            'ids_size':     self.ids_fp.tell(),
+            'archive_size': self.writer.sync(),
+            'done':         done,
+        }
+        tmp = self.ckpt_fn + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump(self.ckpt, fp)
+        os.replace(tmp, self.ckpt_fn)
+
+    def close(self):
+        self.writer.close()
+        self.ids_fp.close()
+
+
+def fetch(session, url, params, retries=5):
+    for attempt in range(retries):
+        try:
+            r = session.get(url, params=params, timeout=60)
+            r.raise_for_status()
+            return r.json()
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError):
+            if attempt == retries - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+async def download(page, session, args):
+    page.open()
+    try:
+        if page.ckpt['done'] and page.count >= args.target:
+            print(f'{page.title}: done ({page.count})')
+            return
+        params = dict(PARAMS, titles=page.title)
+        if page.ckpt['rvcontinue']:
+            params['rvcontinue'] = page.ckpt['rvcontinue']
+        elif page.count > 0:
+            print(f'{page.title}: no more revisions ({page.count})')
+            return
+
+        while page.count < args.target:
+            data = await asyncio.to_thread(fetch, session, args.url, params)
+            revs = []
+            for p in data["query"]["pages"]:
+                if p["title"] == page.title:
+                    revs.extend(p.get("revisions", []))
+            rvcontinue = data.get("continue", {}).get("rvcontinue")
+            await asyncio.to_thread(page.append, revs)
+            done = rvcontinue is None or page.count >= args.target
+            await asyncio.to_thread(page.checkpoint, rvcontinue, done)
+            print(f'{page.title}: {page.count}')
+            if rvcontinue is None:
+                break
+            params["rvcontinue"] = rvcontinue
+            await asyncio.sleep(args.delay)
+    finally:
+        page.close()
+
+
+async def worker(queue, args):
+    session = requests.Session()
+    while True:
+        try:
+            page = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        try:
+            await download(page, session, args)
+        except Exception as e:
+            print(f'{page.title}: failed: {e!r}', file=sys.stderr)
+            args.failed = True
+
+
+async def run(args):
+    os.makedirs(args.out, exist_ok=True)
+    queue = asyncio.Queue()
+    for title in args.titles:
+        queue.put_nowait(Page(title, args.out))
+    await asyncio.gather(*(worker(queue, args) for _ in range(args.jobs)))
+
+
+# Mock API server
+# ===============
+
+class MockHandler(BaseHTTPRequestHandler):
+    num_revs = 100
+
+    def do_GET(self):
+        q = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+        title = q["titles"]
+        start = int(q.get("rvcontinue", 0))
+        end = min(start + int(q.get("rvlimit", 20)), self.num_revs)
+        base = (zlib.crc32(title.encode()) % 1000 + 1) * 1000000
+        revs = [{
+            "revid":     base + i,
+            "parentid":  base + i - 1 if i else 0,
+            "timestamp": f"2001-01-01T00:00:{i % 60:02}Z",
+            "slots": {"main": {
+                "contentmodel":  "wikitext",
+                "contentformat": "text/x-wiki",
+                "content":       mock_content(title, i),
+            }},
+        } for i in range(start, end)]
+        data = {"query": {"pages": [{"title": title, "revisions": revs}]}}
+        if end < self.num_revs:
+            data["continue"] = {"rvcontinue": str(end), "continue": "||"}
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def mock_content(title, i):
+    # Deterministic text that changes a little at every revision
+    rng = random.Random(f'{title} {i // 10}')
+    words = [rng.choice(['lorem', 'ipsum', 'dolor', 'sit', 'amet']) for _ in range(200)]
+    words[i % len(words)] = f'rev{i}'
+    return ' '.join(words)
+
+
+def start_mock_server(num_revs):
+    MockHandler.num_revs = num_revs
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}/w/api.php'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('titles', nargs='+')
+    parser.add_argument('-j', '--jobs', type=int, default=4)
+    parser.add_argument('-n', '--target', type=int, default=500)
+    parser.add_argument('-d', '--delay', type=float, default=1)
+    parser.add_argument('-o', '--out', default=revstore.REVS_DIR)
+    parser.add_argument('--url', default=URL)
+    parser.add_argument('--mock', type=int, metavar='NUM_REVS', default=None,
+                        help='serve NUM_REVS fake revisions per page locally')
+    args = parser.parse_args()
+    args.failed = False
+    if args.mock is not None:
+        args.url = start_mock_server(args.mock)
+        args.delay = 0
+    asyncio.run(run(args))
+    if args.failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()